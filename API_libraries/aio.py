@@ -0,0 +1,147 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Any, AsyncIterator, Callable
+from hippy.hip.device import HipDevice
+from hippy.hip.api.call import ApiCall
+from hippy.hip.api.dir import ApiDir
+from hippy.hip.api.phone import ApiPhone, CallLogRecord
+
+# default number of requests being processed at a time by all devices sharing a transport
+DEFAULT_POOL_SIZE = 32
+
+
+class AsyncTransport:
+    '''
+    This class is a pooled transport for awaitable API wrappers.
+    HipDevice requests are blocking, so they are run on one bounded pool shared by all devices
+    (not a thread per device); authentication and error handling remain those of HipDevice.
+
+    '''
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE) -> None:
+        '''
+        Construct transport
+
+        :param pool_size: maximum number of requests in progress at a time
+        :return: None
+        '''
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='hip-aio')
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        '''
+        Runs blocking API call on the pool and waits for its result
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+_default_transport: Optional[AsyncTransport] = None
+
+
+def default_transport() -> AsyncTransport:
+    '''
+    Returns transport shared by all wrappers created without explicit transport
+    '''
+    global _default_transport
+    if _default_transport is None:
+        _default_transport = AsyncTransport()
+    return _default_transport
+
+
+class AsyncApiCall:
+    '''Awaitable counterpart of ApiCall, see ApiCall for methods description
+    '''
+
+    def __init__(self, device: HipDevice, transport: Optional[AsyncTransport] = None) -> None:
+        self.api: ApiCall = ApiCall(device)
+        self.transport: AsyncTransport = transport or default_transport()
+
+    @property
+    def device(self) -> HipDevice:
+        return self.api.device
+
+    async def get_status(self, session: Optional[int] = None) -> dict:
+        return await self.transport.run(self.api.get_status, session)
+
+    async def post_dial(self, number: Optional[str] = None, users: Optional[list[str]] = None) -> dict:
+        return await self.transport.run(self.api.post_dial, number, users)
+
+    async def post_answer(self, session: int) -> None:
+        await self.transport.run(self.api.post_answer, session)
+
+    async def post_hangup(self, session: int, reason: Optional[str] = None) -> None:
+        await self.transport.run(self.api.post_hangup, session, reason)
+
+
+class AsyncApiDir:
+    '''Awaitable counterpart of ApiDir, see ApiDir for methods description
+    '''
+
+    def __init__(self, device: HipDevice, transport: Optional[AsyncTransport] = None) -> None:
+        self.api: ApiDir = ApiDir(device)
+        self.transport: AsyncTransport = transport or default_transport()
+
+    @property
+    def device(self) -> HipDevice:
+        return self.api.device
+
+    async def get_template(self) -> dict:
+        return await self.transport.run(self.api.get_template)
+
+    async def post_get(self, fields: Optional[list[str]] = None, users: Optional[list[Any]] = None) -> dict:
+        return await self.transport.run(self.api.post_get, fields, users)
+
+    async def put_create(self, force: Optional[bool] = None, users: Optional[list[Any]] = None) -> dict:
+        return await self.transport.run(self.api.put_create, force, users)
+
+    async def put_delete(self, owner: Optional[str] = None, users: Optional[list[Any]] = None) -> dict:
+        return await self.transport.run(self.api.put_delete, owner, users)
+
+    async def put_update(self, users: list[Any]) -> dict:
+        return await self.transport.run(self.api.put_update, users)
+
+    async def post_query(self, fields: Optional[list[str]] = None, series: Optional[str] = None,
+                         iterator: Optional[int] = 0) -> dict:
+        return await self.transport.run(self.api.post_query, fields, series, iterator)
+
+    async def iter_query(self, fields: Optional[list[str]] = None, series: Optional[str] = None,
+                         iterator: int = 0, deleted: bool = False) -> AsyncIterator[dict]:
+        chunks = self.api.iter_query_chunks(fields, series, iterator, deleted)
+        while True:
+            chunk = await self.transport.run(next, chunks, None)
+            if chunk is None:
+                return
+            for user in chunk['users']:
+                yield user
+
+    async def put_validate(self, params: dict[str, Any]) -> None:
+        await self.transport.run(self.api.put_validate, params)
+
+
+class AsyncApiPhone:
+    '''Awaitable counterpart of ApiPhone, see ApiPhone for methods description
+    '''
+
+    def __init__(self, device: HipDevice, transport: Optional[AsyncTransport] = None) -> None:
+        self.api: ApiPhone = ApiPhone(device)
+        self.transport: AsyncTransport = transport or default_transport()
+
+    @property
+    def device(self) -> HipDevice:
+        return self.api.device
+
+    async def get_status(self, account: Optional[int]) -> dict:
+        return await self.transport.run(self.api.get_status, account)
+
+    async def get_calllog(self, id: Optional[int] = None) -> dict:
+        return await self.transport.run(self.api.get_calllog, id)
+
+    async def iter_calllog(self, reset: bool = False) -> AsyncIterator[CallLogRecord]:
+        # new entries are read by one request, the cursor is kept by the wrapped ApiPhone
+        records = await self.transport.run(lambda: list(self.api.iter_calllog(reset)))
+        for record in records:
+            yield record
@@ -0,0 +1,157 @@
+import threading
+import time
+from typing import Optional, Any
+from hippy.hip.api.call import ApiCall
+
+# default time (seconds) for which a status response is served from cache. Shorter than the first
+# polling interval of wait_for (0.1 s with jitter), so a single waiter always gets fresh state,
+# while concurrent waiters of one device share the poll
+DEFAULT_TTL = 0.05
+
+
+class CallSession:
+    '''Compact model of one call session and its state transitions
+    '''
+    __slots__ = ('session', 'direction', 'state', 'transitions')
+
+    def __init__(self, session: int, direction: Optional[str], state: Optional[str], timestamp: float) -> None:
+        self.session: int = session
+        self.direction: Optional[str] = direction
+        self.state: Optional[str] = state
+        # list of (monotonic time, state) tuples, the first item is the initial state
+        self.transitions: list[tuple[float, Optional[str]]] = [(timestamp, state)]
+
+    def update(self, state: Optional[str], timestamp: float) -> None:
+        if state != self.state:
+            self.state = state
+            self.transitions.append((timestamp, state))
+
+    def __repr__(self) -> str:
+        return f'CallSession({self.session}, {self.direction}, {self.state})'
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[dict] = None
+        self.error: Optional[BaseException] = None
+
+
+class CallTracker:
+    '''
+    This class tracks call sessions of one device on top of ApiCall.
+    Concurrent status requests are merged into one in-flight HTTP request (single-flight)
+    and responses are served from a short-lived cache, so several waiters polling the same
+    device share one poll. Dial, answer and hangup are delegated to ApiCall and invalidate the cache.
+
+    '''
+
+    ENDED = 'ended'
+
+    # trackers shared by all tests, by device address
+    _shared: dict[str, 'CallTracker'] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, call: ApiCall, ttl: float = DEFAULT_TTL) -> None:
+        '''
+        Construct call tracker
+
+        :param call: Instance of ApiCall
+        :param ttl: time (seconds) for which a status response is served from cache
+        :return: None
+        '''
+        self.call: ApiCall = call
+        self.ttl: float = ttl
+        self.sessions: dict[int, CallSession] = {}
+        self.polls: int = 0
+        self._lock = threading.Lock()
+        self._flight: Optional[_Flight] = None
+        self._cached: Optional[dict] = None
+        self._cached_at: float = 0.0
+
+    @classmethod
+    def shared(cls, call: ApiCall, ttl: float = DEFAULT_TTL) -> 'CallTracker':
+        '''
+        Returns tracker of the device shared within the process, created by the first caller,
+        so waiters of different tests and fixtures polling the same device share one poll
+        '''
+        key = str(call.device._address)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(call, ttl)
+            return cls._shared[key]
+
+    def get_status(self, session: Optional[int] = None) -> dict:
+        '''List and get info about call session status (see ApiCall.get_status).
+        Sessions missing in cached response are requested from the device directly,
+        so errors for unknown sessions are reported by the device as usual.
+        '''
+        rsp = self._status()
+        if session is None:
+            return rsp
+        sessions = [item for item in rsp['sessions'] if item.get('session') == session]
+        if sessions:
+            return {**rsp, 'sessions': sessions}
+        return self.call.get_status(session)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cached = None
+
+    def post_dial(self, number: Optional[str] = None, users: Optional[list[str]] = None) -> dict:
+        self.invalidate()
+        return self.call.post_dial(number, users)
+
+    def post_answer(self, session: int) -> None:
+        self.invalidate()
+        self.call.post_answer(session)
+
+    def post_hangup(self, session: int, reason: Optional[str] = None) -> None:
+        self.invalidate()
+        self.call.post_hangup(session, reason)
+
+    def _status(self) -> dict:
+        with self._lock:
+            if self._cached is not None and time.monotonic() - self._cached_at < self.ttl:
+                return self._cached
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+        assert flight is not None
+        if leader:
+            try:
+                flight.result = self.call.get_status()
+            except BaseException as e:
+                flight.error = e
+            with self._lock:
+                self._flight = None
+                self.polls += 1
+                if flight.result is not None:
+                    self._cached = flight.result
+                    self._cached_at = time.monotonic()
+                    self._track(flight.result)
+            flight.done.set()
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        assert flight.result is not None
+        return flight.result
+
+    def _track(self, rsp: dict[str, Any]) -> None:
+        now = time.monotonic()
+        active = set()
+        for item in rsp.get('sessions', []):
+            session_id = item.get('session')
+            active.add(session_id)
+            state = item.get('state')
+            if session_id in self.sessions:
+                self.sessions[session_id].update(state, now)
+            else:
+                self.sessions[session_id] = CallSession(session_id, item.get('direction'), state, now)
+        for session_id, tracked in self.sessions.items():
+            if session_id not in active:
+                tracked.update(self.ENDED, now)
@@ -0,0 +1,202 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from enum import Enum
+from typing import Optional, Any
+import requests
+from hippy.hip.device import HipDevice
+
+# HipDevice methods sending requests to the device, intercepted by recorder and replayer
+REQUEST_METHODS = ('api_request', 'api_get', 'api_post', 'api_put', 'api_delete')
+# HipDevice methods built on request methods (e.g. config upload). They run on the proxy,
+# so their requests are recorded and replayed as well
+COMPOSITE_METHODS = ('upload_config',)
+CASSETTE_MODES = ('record', 'replay')
+
+
+def _body(value: Any) -> Any:
+    # request body serialized for hashing: files dict of blobs, file tuples, BlobParam, file objects or raw bytes.
+    # Unknown types are rejected, their repr could hold object address and break matching on replay
+    if isinstance(value, Enum):
+        return _body(value.value)
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    if isinstance(value, dict):
+        return {str(key): _body(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_body(item) for item in value]
+    if callable(getattr(value, 'read', None)):
+        # file object is read from its current position, which is restored for the request itself
+        position = value.tell()
+        content = value.read()
+        value.seek(position)
+        return _body(content)
+    for attribute in ('data', 'content', 'value'):
+        if isinstance(getattr(value, attribute, None), (bytes, bytearray, str)):
+            return _body(getattr(value, attribute))
+    raise TypeError(f'Request body of type {type(value).__name__} can not be stored in cassette')
+
+
+def cassette_path(directory: str, dut: str, firmware: str, name: str) -> str:
+    '''
+    Returns cassette file path of a device used in a run against given DUT and firmware:
+    <directory>/<dut>/<firmware>/<name>.json.gz, characters unsafe in file names are replaced by '_'
+    '''
+    safe = [re.sub(r'[^\w.-]', '_', part) for part in (str(dut), firmware, name)]
+    return os.path.join(directory, safe[0], safe[1], f'{safe[2]}.json.gz')
+
+
+def request_key(name: str, args: tuple, kwargs: dict[str, Any]) -> str:
+    '''
+    Returns key of a request used for matching: HTTP method, path, params and hash of blob body
+    '''
+    args = list(args)
+    method = args.pop(0) if name == 'api_request' else name[len('api_'):].upper()
+    path = args.pop(0) if args else kwargs.pop('path', None)
+    kwargs = dict(kwargs)
+    params = kwargs.pop('params', None) or {}
+    body = {key: _body(value) for key, value in kwargs.items()}
+    digest = hashlib.sha1(repr(sorted(body.items())).encode('utf-8')).hexdigest() if body else ''
+    return json.dumps([method.upper(), path, sorted((str(k), str(v)) for k, v in params.items()), args and repr(args), digest])
+
+
+class Cassette:
+    '''
+    Recorded request/response pairs of one device, stored in gzipped JSON file.
+    Responses of the same request are replayed in recorded order, the last one is repeated
+    when the request is sent more times than recorded (e.g. status polling).
+
+    '''
+
+    def __init__(self, path: Optional[str]) -> None:
+        self.path: Optional[str] = path
+        self.info: dict[str, Any] = {}
+        self.interactions: dict[str, list[dict]] = {}
+        self._positions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        cassette = cls(path)
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            data = json.load(file)
+        cassette.info = data['info']
+        cassette.interactions = data['interactions']
+        return cassette
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with gzip.open(self.path, 'wt', encoding='utf-8') as file:
+            json.dump({'info': self.info, 'interactions': self.interactions}, file, separators=(',', ':'))
+
+    def record(self, key: str, response: requests.Response) -> None:
+        with self._lock:
+            self.interactions.setdefault(key, []).append({
+                'status': response.status_code,
+                'content_type': response.headers.get('Content-Type', ''),
+                'body': base64.b64encode(response.content).decode('ascii'),
+            })
+
+    def replay(self, key: str) -> requests.Response:
+        with self._lock:
+            if key not in self.interactions:
+                raise KeyError(f'Request {key} was not recorded in cassette {self.path}')
+            responses = self.interactions[key]
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        recorded = responses[min(position, len(responses) - 1)]
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.headers['Content-Type'] = recorded['content_type']
+        response._content = base64.b64decode(recorded['body'])
+        response.encoding = 'utf-8'
+        return response
+
+
+class RecordingDevice:
+    '''
+    Proxy of HipDevice, recording every request and response into cassette.
+    Can be passed to ApiDir, ApiCall or ApiPhone instead of HipDevice.
+
+    '''
+
+    def __init__(self, device: HipDevice, path: Optional[str], firmware: Optional[str] = None) -> None:
+        '''
+        :param device: Instance of HipDevice
+        :param path: cassette file path (see cassette_path), can be set later in cassette.path,
+        e.g. when firmware is known only after the first requests
+        :param firmware: firmware version stored in cassette info
+        '''
+        self._device: HipDevice = device
+        self.cassette: Cassette = Cassette(path)
+        self.cassette.info = {'address': str(device._address), 'firmware': firmware}
+
+    def __getattr__(self, name: str) -> Any:
+        if name in COMPOSITE_METHODS:
+            return getattr(type(self._device), name).__get__(self)
+        attribute = getattr(self._device, name)
+        if name not in REQUEST_METHODS:
+            return attribute
+
+        def recorded(*args: Any, **kwargs: Any) -> Any:
+            # key is taken before sending, file objects in body are not read yet
+            key = request_key(name, args, kwargs)
+            response = attribute(*args, **kwargs)
+            self.cassette.record(key, response)
+            return response
+        return recorded
+
+    def save(self) -> None:
+        self.cassette.save()
+
+
+class ReplayDevice:
+    '''
+    Stand-in of HipDevice answering requests from cassette, without any network communication.
+    Can be passed to ApiDir, ApiCall or ApiPhone instead of HipDevice.
+
+    '''
+
+    def __init__(self, path: str, firmware: Optional[str] = None) -> None:
+        '''
+        :param path: cassette file path recorded by RecordingDevice
+        :param firmware: expected firmware version, cassette recorded with other firmware is rejected
+        '''
+        self.cassette: Cassette = Cassette.load(path)
+        recorded = self.cassette.info.get('firmware')
+        if firmware is not None and recorded != firmware:
+            raise ValueError(f'Cassette {path} was recorded with firmware {recorded}, expected {firmware}')
+        self._address: str = self.cassette.info.get('address', '')
+
+    def __getattr__(self, name: str) -> Any:
+        if name in COMPOSITE_METHODS:
+            return getattr(HipDevice, name).__get__(self)
+        if name not in REQUEST_METHODS:
+            raise AttributeError(f'{name} is not available on replayed device')
+        return lambda *args, **kwargs: self.cassette.replay(request_key(name, args, kwargs))
+
+
+def cassette_device(device: HipDevice, mode: Optional[str], path: Optional[str],
+                    firmware: Optional[str] = None) -> Any:
+    '''
+    Returns device for given cassette mode: RecordingDevice, ReplayDevice or device itself when mode is None
+    :param device: Instance of HipDevice, not used for requests in replay mode
+    :param mode: one of CASSETTE_MODES or None
+    :param path: cassette file path, can be None when recording starts before firmware is known
+    :param firmware: firmware version stored in cassette info when recording, verified when replaying
+    '''
+    if mode is None:
+        return device
+    if mode == 'record':
+        return RecordingDevice(device, path, firmware)
+    if mode == 'replay':
+        return ReplayDevice(path, firmware)
+    raise ValueError(f'Unknown cassette mode {mode}, expected one of {CASSETTE_MODES}')
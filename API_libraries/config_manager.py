@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from typing import Optional, Callable
+from hippy.hip.device import HipDevice
+
+# interval (seconds) between readiness probes
+PROBE_PERIOD = 0.25
+# time (seconds) after upload before the first probe, the device needs a moment to start reloading
+RELOAD_START_DELAY = 0.5
+
+
+class ConfigManager:
+    '''
+    This class uploads configuration to devices only when it differs from the configuration
+    applied last time. After an upload, readiness of the device is polled until it drops
+    (reload started) and comes back, so the test does not start while the device is still reloading.
+
+    '''
+
+    # hash of the last configuration applied to each device address in this process
+    applied: dict[str, str] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def apply(cls, device: HipDevice, config: bytes, ready: Optional[Callable[[], bool]] = None,
+              timeout: float = 3 * HipDevice.DB_RELOAD_TIME, initial_delay: float = RELOAD_START_DELAY) -> bool:
+        '''
+        Uploads configuration, unless the same configuration has already been applied to the device
+
+        :param device: Instance of HipDevice
+        :param config: configuration file content
+        :param ready: readiness probe returning True when the device reloaded configuration. It must check
+        state dropped by the reload (e.g. SIP registration), not a value already valid before the upload.
+        Exceptions raised by the probe (device busy reloading) are treated as not ready.
+        When omitted, HipDevice.DB_RELOAD_TIME is waited as before.
+        :param timeout: maximum time to wait for the device to become ready again
+        :param initial_delay: time to wait before the first probe
+        :return: True when configuration was uploaded, False when upload was skipped
+        '''
+        digest = hashlib.sha256(config).hexdigest()
+        key = str(device._address)
+        with cls._lock:
+            if cls.applied.get(key) == digest:
+                return False
+            # forget the hash until the device is ready, a failed upload must be retried next time
+            cls.applied.pop(key, None)
+        device.upload_config(config)
+        if ready is None:
+            time.sleep(HipDevice.DB_RELOAD_TIME)
+        else:
+            cls.wait_ready(ready, timeout, initial_delay)
+        with cls._lock:
+            cls.applied[key] = digest
+        return True
+
+    @classmethod
+    def forget(cls, device: HipDevice) -> None:
+        '''
+        Forgets configuration applied to the device, e.g. after its factory reset
+        '''
+        with cls._lock:
+            cls.applied.pop(str(device._address), None)
+
+    @staticmethod
+    def wait_ready(ready: Callable[[], bool], timeout: float, initial_delay: float = RELOAD_START_DELAY) -> None:
+        '''
+        Waits until the probe reports the device not ready (reload started) and then ready again.
+        When the probe does not drop within HipDevice.DB_RELOAD_TIME after the upload, the reload is
+        considered finished, as it was with the fixed wait
+        '''
+        time.sleep(initial_delay)
+        start = time.monotonic()
+        deadline = start + timeout
+        reloading = False
+        while time.monotonic() < deadline:
+            try:
+                is_ready = ready()
+            except Exception:
+                is_ready = False
+            if not is_ready:
+                reloading = True
+            elif reloading or time.monotonic() - start >= HipDevice.DB_RELOAD_TIME - initial_delay:
+                return
+            time.sleep(PROBE_PERIOD)
+        raise TimeoutError(f'Device is not ready within {timeout}s after configuration upload')
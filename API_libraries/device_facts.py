@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Optional, Any
+from hippy.hip.device import HipDevice
+from hippy.hip.api.system import ApiSystem
+
+# default time (seconds) for which facts persisted on disk are valid
+DEFAULT_TTL = 3600
+
+
+class DeviceFacts:
+    '''
+    This class caches /api/system/info of devices for the whole session, so report plugin,
+    fixtures and the GUI share one request per device. Facts can be persisted on disk
+    (by device address, with firmware and time of the request) and prefetched in background.
+    Facts persisted by another run are used only when the device was not restarted since
+    (e.g. reflashed), which is checked by uptime from /api/system/status.
+
+    '''
+
+    _shared: Optional['DeviceFacts'] = None
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL) -> None:
+        '''
+        Construct device facts cache
+
+        :param path: optional JSON file for facts persisted between runs
+        :param ttl: time (seconds) for which persisted facts are valid
+        :return: None
+        '''
+        self.path: Optional[str] = path
+        self.ttl: float = ttl
+        self._facts: dict[str, dict] = {}
+        self._pending: dict[str, threading.Thread] = {}
+        # addresses with facts requested or validated by this process
+        self._checked: set[str] = set()
+        self._lock = threading.Lock()
+        self._facts = self._read()
+
+    def _read(self) -> dict[str, dict]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        with open(self.path) as file:
+            return json.load(file)
+
+    @classmethod
+    def shared(cls, path: Optional[str] = None, ttl: float = DEFAULT_TTL) -> 'DeviceFacts':
+        '''
+        Returns cache shared within the process, created by the first caller
+        '''
+        if cls._shared is None:
+            cls._shared = cls(path, ttl)
+        return cls._shared
+
+    def cached(self, address: str, firmware: Optional[str] = None) -> Optional[dict]:
+        '''
+        Returns cached info without contacting the device, None when missing, expired
+        or taken with other firmware than expected
+        '''
+        entry = self._facts.get(address)
+        if entry is None or time.time() - entry['time'] > self.ttl:
+            return None
+        if firmware is not None and entry['firmware'] != firmware:
+            return None
+        return entry['info']
+
+    def get(self, device: HipDevice, firmware: Optional[str] = None) -> dict:
+        '''
+        Returns info of the device (result section of /api/system/info), requested only once
+
+        :param device: Instance of HipDevice
+        :param firmware: expected firmware version, cached facts of other firmware are refreshed
+        :return: Dictionary representing result section of JSON response.
+        '''
+        pending = self._pending.get(str(device._address))
+        if pending is not None:
+            pending.join()
+        return self._get(device, firmware)
+
+    def _get(self, device: HipDevice, firmware: Optional[str] = None) -> dict:
+        address = str(device._address)
+        info = self.cached(address, firmware)
+        if info is not None and address not in self._checked and not self._valid(device, address):
+            info = None
+        if info is None:
+            info = ApiSystem(device).get_info()
+            self.store(address, info)
+        self._checked.add(address)
+        return info
+
+    def _valid(self, device: HipDevice, address: str) -> bool:
+        # persisted facts are valid when taken after the last start of the device
+        try:
+            uptime = HipDevice.api_process_json_result(device.api_get('/api/system/status'))['upTime']
+        except Exception:
+            return False
+        return self._facts[address]['time'] > time.time() - uptime
+
+    def prefetch(self, device: HipDevice) -> None:
+        '''
+        Requests info of the device in background, get() waits for the result
+        '''
+        address = str(device._address)
+        with self._lock:
+            if address in self._pending or address in self._checked:
+                return
+            thread = threading.Thread(target=self._fetch, args=(device,), daemon=True)
+            self._pending[address] = thread
+        thread.start()
+
+    def _fetch(self, device: HipDevice) -> None:
+        try:
+            self._get(device)
+        except Exception:
+            pass    # get() requests the info again and reports the error
+        finally:
+            with self._lock:
+                self._pending.pop(str(device._address), None)
+
+    def store(self, address: str, info: dict[str, Any]) -> None:
+        '''
+        Caches info of the device. File is re-read first, so parallel runs don't overwrite each other's devices
+        '''
+        with self._lock:
+            entry = {'time': time.time(), 'firmware': info.get('swVersion'), 'info': info}
+            self._facts[address] = entry
+            if self.path:
+                facts = self._read()
+                facts[address] = entry
+                directory = os.path.dirname(os.path.abspath(self.path))
+                with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as file:
+                    json.dump(facts, file, indent=1)
+                os.replace(file.name, self.path)
@@ -1,4 +1,4 @@
-from typing import Optional, Any
+from typing import Optional, Any, Iterator
 from hippy.hip.device import HipDevice
 from hippy.hip.types import BlobType, BlobParam
 import json
@@ -10,14 +10,17 @@ class ApiDir:
 
     '''
 
-    def __init__(self, device: HipDevice) -> None:
+    def __init__(self, device: HipDevice, query_page_size: Optional[int] = None) -> None:
         '''
         Construct directory object
 
         :param device: Instance of HipDevice
+        :param query_page_size: An optional maximum number of users returned by one /api/dir/query call.
+        When known, a shorter chunk ends iter_query walk without another (empty) query.
         :return: None
         '''
         self.device: HipDevice = device
+        self.query_page_size: Optional[int] = query_page_size
 
     def get_template(self) -> dict:
         '''
@@ -82,11 +85,7 @@ class ApiDir:
             data["force"] = force
         if users is not None:
             data["users"] = users
-        files = {BlobType.DIR_NEW.value: json.dumps(data).encode('utf-8')}
-
-        return HipDevice.api_process_json_result(
-            self.device.api_put('/api/dir/create', files=files)
-        )
+        return self.put_blob('/api/dir/create', json.dumps(data).encode('utf-8'))
 
     def put_delete(self, owner: Optional[str] = None, users: Optional[list[Any]] = None) -> dict:
         '''function allows deleting a list of users given by their UUIDs (uuid is mandatory and
@@ -105,11 +104,7 @@ class ApiDir:
             data["owner"] = owner
         if users:
             data["users"] = users
-        files = {BlobType.DIR_NEW.value: json.dumps(data).encode('utf-8')}
-
-        return HipDevice.api_process_json_result(
-            self.device.api_put('/api/dir/delete', files=files)
-        )
+        return self.put_blob('/api/dir/delete', json.dumps(data).encode('utf-8'))
 
     def put_update(self, users: list[Any]) -> dict:
         '''function allows updating a list of users using provided fields. Users are identified by UUIDs
@@ -123,10 +118,20 @@ class ApiDir:
         '''
 
         data: dict[str, Any] = {"users": users}
-        files = {BlobType.DIR_NEW.value: json.dumps(data).encode('utf-8')}
+        return self.put_blob('/api/dir/update', json.dumps(data).encode('utf-8'))
+
+    def put_blob(self, path: str, blob: bytes) -> dict:
+        '''function sends already serialized JSON blob to one of create, update or delete endpoints.
+        It allows to serialize a payload once and send it to several devices.
+
+        :param path: endpoint path, e.g. /api/dir/create
+        :param blob: JSON encoded request data
+        :return: Dictionary representing result section of JSON response.
+        '''
+        files = {BlobType.DIR_NEW.value: blob}
 
         return HipDevice.api_process_json_result(
-            self.device.api_put('/api/dir/update', files=files)
+            self.device.api_put(path, files=files)
         )
 
     def post_query(self, fields: Optional[list[str]] = None, series: Optional[str] = None,
@@ -152,6 +157,64 @@ class ApiDir:
         '''
         return self._query(fields, series, iterator)
 
+    def iter_query(self, fields: Optional[list[str]] = None, series: Optional[str] = None,
+                   iterator: int = 0, deleted: bool = False) -> Iterator[dict]:
+        '''generator walking the directory chunk by chunk, using the timestamp iterator as a cursor.
+        Users are yielded one by one as soon as their chunk is received, so the caller can stop
+        after the first match without loading the whole directory.
+
+        :param fields: An optional array of field names to be returned (see post_query).
+        :param series: An optional string parameter specifying expected directory series (see post_query).
+        :param iterator: Timestamp of the first directory entry to be returned. Zero means from the beginning.
+        :param deleted: yield also entries of deleted users ({'uuid': ..., 'deleted': True}), returned
+        by device for non-zero iterator. Needed only by callers replicating changes (e.g. DirMirror).
+        :return: Iterator over user dictionaries from the result section of JSON responses.
+        '''
+        for chunk in self.iter_query_chunks(fields, series, iterator, deleted):
+            yield from chunk['users']
+
+    def iter_query_chunks(self, fields: Optional[list[str]] = None, series: Optional[str] = None,
+                          iterator: int = 0, deleted: bool = False) -> Iterator[dict]:
+        '''generator returning the result sections of consecutive /api/dir/query calls.
+        Each chunk starts where the previous one ended, the walk stops on the first empty chunk,
+        or on a chunk shorter than query_page_size when it is set. Parameters are the same as in iter_query. Unless deleted is True, entries of deleted users
+        are removed from chunks and chunks left empty are skipped.
+
+        :return: Iterator over dictionaries representing result section of JSON response.
+        '''
+        while True:
+            rsp = self._query(fields, series, iterator)
+            # pin the series of the first chunk, so a directory reset during the walk is reported by device
+            series = series or rsp.get('series')
+            users = rsp.get('users', [])
+            if not users:
+                return
+            if deleted:
+                yield rsp
+            else:
+                existing = [user for user in users if not user.get('deleted')]
+                if existing:
+                    yield {**rsp, 'users': existing}
+            if self.query_page_size and len(users) < self.query_page_size:
+                return
+            next_iterator = self.next_iterator(rsp)
+            if next_iterator <= iterator:
+                return
+            iterator = next_iterator
+
+    @staticmethod
+    def next_iterator(rsp: dict) -> int:
+        '''returns timestamp iterator of the first entry following given query result.
+        Iterator returned by the device is preferred, otherwise it is derived from the newest user.
+
+        :param rsp: Dictionary representing result section of /api/dir/query JSON response.
+        :return: Timestamp to be passed as iterator to the next query.
+        '''
+        next_iterator = rsp.get('iterator', {}).get('timestamp')
+        if next_iterator is None:
+            next_iterator = max(user['timestamp'] for user in rsp['users']) + 1
+        return next_iterator
+
     def _query(self, fields: Optional[list[str]] = None, series: Optional[str] = None, iterator: Optional[int] = 0, *,
                method: str = "POST") -> dict:
         data: dict[str, Any] = {}
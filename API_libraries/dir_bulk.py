@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Any, Callable, Iterator
+from hippy.hip.api.dir import ApiDir
+import json
+
+# default maximum size of JSON blob sent in one request (bytes)
+DEFAULT_MAX_BLOB_SIZE = 64 * 1024
+# default number of requests being processed by the device at a time
+DEFAULT_WORKERS = 4
+# per-user error code reported for users of a chunk, which request failed as a whole (not a device code)
+EDIR_REQUEST_FAILED = 'EDIR_REQUEST_FAILED'
+
+
+def split_users(users: list[Any], max_blob_size: int = DEFAULT_MAX_BLOB_SIZE) -> Iterator[list[Any]]:
+    '''Splits users into chunks, which serialized size does not exceed max_blob_size.
+    A user exceeding the limit by itself is sent in its own chunk.
+
+    :param users: An array of users
+    :param max_blob_size: maximum size of JSON blob sent in one request (bytes)
+    :return: Iterator over lists of users
+    '''
+    # room for the envelope: {"force": false, "users": []}
+    envelope = len(json.dumps({'force': False, 'users': []}))
+    chunk: list[Any] = []
+    size = envelope
+    for user in users:
+        user_size = len(json.dumps(user).encode('utf-8')) + 2    # separator ", "
+        if chunk and size + user_size > max_blob_size:
+            yield chunk
+            chunk = []
+            size = envelope
+        chunk.append(user)
+        size += user_size
+    if chunk:
+        yield chunk
+
+
+def failed_chunk(chunk: list[Any], error: Exception) -> dict:
+    '''Returns result section for a chunk, which request failed, with the error reported for each of its users.
+    '''
+    item = {'errors': [{'code': EDIR_REQUEST_FAILED, 'description': str(error)}]}
+    return {'users': [{'uuid': user['uuid'], **item} if 'uuid' in user else dict(item) for user in chunk]}
+
+
+def merge_results(results: list[dict]) -> dict:
+    '''Merges result sections of chunked create/update/delete responses, keeping users order.
+    '''
+    merged: dict[str, Any] = {'users': []}
+    for rsp in results:
+        merged['users'].extend(rsp.get('users', []))
+        if 'timestamp' in rsp:
+            merged['timestamp'] = max(merged.get('timestamp', 0), rsp['timestamp'])
+    return merged
+
+
+class DirBulk:
+    '''
+    This class provides bulk provisioning on top of directory API.
+    User lists are split into chunks bounded by serialized blob size and the chunks
+    are submitted by a bounded pool of workers. Per-user results are merged back in input order.
+    A failed request does not discard results of other chunks, its users are reported
+    with EDIR_REQUEST_FAILED error, so the caller can see which users landed.
+
+    '''
+
+    def __init__(self, directory: ApiDir, max_blob_size: int = DEFAULT_MAX_BLOB_SIZE,
+                 workers: int = DEFAULT_WORKERS) -> None:
+        '''
+        Construct bulk provisioning object
+
+        :param directory: Instance of ApiDir
+        :param max_blob_size: maximum size of JSON blob sent in one request (bytes)
+        :param workers: maximum number of requests being sent concurrently
+        :return: None
+        '''
+        self.directory: ApiDir = directory
+        self.max_blob_size: int = max_blob_size
+        self.workers: int = workers
+
+    def put_create(self, users: list[Any], force: Optional[bool] = None) -> dict:
+        '''Creates users in chunks (see ApiDir.put_create)
+
+        :param users: An array of users to be created.
+        :param force: An optional boolean flag to force user creation.
+        :return: Dictionary representing merged result sections of JSON responses.
+        '''
+        return self._submit(lambda chunk: self.directory.put_create(force=force, users=chunk), users)
+
+    def put_update(self, users: list[Any]) -> dict:
+        '''Updates users in chunks (see ApiDir.put_update)
+
+        :param users: An array of users to be updated.
+        :return: Dictionary representing merged result sections of JSON responses.
+        '''
+        return self._submit(self.directory.put_update, users)
+
+    def put_delete(self, users: list[Any]) -> dict:
+        '''Deletes users in chunks (see ApiDir.put_delete)
+
+        :param users: An array of users to be deleted, uuid is the only expected field.
+        :return: Dictionary representing merged result sections of JSON responses.
+        '''
+        return self._submit(lambda chunk: self.directory.put_delete(users=chunk), users)
+
+    def chunks(self, users: list[Any]) -> Iterator[list[Any]]:
+        '''Splits users into chunks, which serialized size does not exceed max_blob_size
+        (see split_users).
+        '''
+        return split_users(users, self.max_blob_size)
+
+    def _submit(self, request: Callable[[list[Any]], dict], users: list[Any]) -> dict:
+        chunks = list(self.chunks(users))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures: list[Future] = [executor.submit(request, chunk) for chunk in chunks]
+        results: list[dict] = []
+        for chunk, future in zip(chunks, futures):
+            try:
+                results.append(future.result())
+            except Exception as error:
+                results.append(failed_chunk(chunk, error))
+        return merge_results(results)
@@ -0,0 +1,82 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Any
+from hippy.hip.device import HipDevice
+from hippy.hip.api.dir import ApiDir
+from hippy.hip.api.dir_bulk import split_users, merge_results, DEFAULT_MAX_BLOB_SIZE
+
+# default number of requests being processed by one device at a time
+DEFAULT_DEVICE_CONCURRENCY = 2
+
+
+@dataclass
+class FanoutResult:
+    device: HipDevice
+    result: Optional[dict] = None
+    error: Optional[Exception] = None
+    duration: float = 0.0
+
+
+class DirFanout:
+    '''
+    This class provisions the same set of users onto several devices concurrently.
+    Payload is split into chunks and serialized only once, the same bytes are sent to every device.
+    Each device receives at most device_concurrency requests at a time.
+
+    '''
+
+    def __init__(self, devices: list[HipDevice], device_concurrency: int = DEFAULT_DEVICE_CONCURRENCY,
+                 max_blob_size: int = DEFAULT_MAX_BLOB_SIZE) -> None:
+        '''
+        Construct fan-out provisioning object
+
+        :param devices: list of HipDevice instances to be provisioned
+        :param device_concurrency: maximum number of requests sent to one device at a time
+        :param max_blob_size: maximum size of JSON blob sent in one request (bytes)
+        :return: None
+        '''
+        self.devices: list[HipDevice] = devices
+        self.device_concurrency: int = device_concurrency
+        self.max_blob_size: int = max_blob_size
+
+    def put_create(self, users: list[Any], force: Optional[bool] = None) -> list[FanoutResult]:
+        '''Creates users on all devices (see ApiDir.put_create)
+
+        :return: List of per-device results in the order of devices
+        '''
+        extra = {} if force is None else {'force': force}
+        return self._submit('/api/dir/create', users, extra)
+
+    def put_update(self, users: list[Any]) -> list[FanoutResult]:
+        '''Updates users on all devices (see ApiDir.put_update)
+
+        :return: List of per-device results in the order of devices
+        '''
+        return self._submit('/api/dir/update', users, {})
+
+    def put_delete(self, users: list[Any]) -> list[FanoutResult]:
+        '''Deletes users on all devices (see ApiDir.put_delete)
+
+        :return: List of per-device results in the order of devices
+        '''
+        return self._submit('/api/dir/delete', users, {})
+
+    def _submit(self, path: str, users: list[Any], extra: dict[str, Any]) -> list[FanoutResult]:
+        blobs = [json.dumps({**extra, 'users': chunk}).encode('utf-8')
+                 for chunk in split_users(users, self.max_blob_size)]
+        with ThreadPoolExecutor(max_workers=len(self.devices) or 1) as executor:
+            return list(executor.map(lambda device: self._provision(device, path, blobs), self.devices))
+
+    def _provision(self, device: HipDevice, path: str, blobs: list[bytes]) -> FanoutResult:
+        directory = ApiDir(device)
+        result = FanoutResult(device)
+        start = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=self.device_concurrency) as executor:
+                result.result = merge_results(list(executor.map(lambda blob: directory.put_blob(path, blob), blobs)))
+        except Exception as e:
+            result.error = e
+        result.duration = time.monotonic() - start
+        return result
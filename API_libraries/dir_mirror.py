@@ -0,0 +1,103 @@
+from typing import Optional, Any
+from hippy.hip.api.dir import ApiDir
+
+
+class DirMirror:
+    '''
+    This class is a client-side replica of device directory.
+    It is synchronized incrementally using timestamp iterator and directory series,
+    so repeated reads are served locally instead of querying the device again.
+
+    '''
+
+    def __init__(self, directory: ApiDir, fields: Optional[list[str]] = None) -> None:
+        '''
+        Construct directory mirror
+
+        :param directory: Instance of ApiDir
+        :param fields: An optional array of field names to be mirrored (see ApiDir.post_query).
+        By default all fields containing non-default values are mirrored.
+        :return: None
+        '''
+        self.directory: ApiDir = directory
+        self.fields: Optional[list[str]] = fields
+        self.series: Optional[str] = None
+        self.iterator: int = 0
+        self._users: dict[str, dict] = {}
+        self._owners: dict[str, dict[str, None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, uuid: str) -> bool:
+        return uuid in self._users
+
+    def clear(self) -> None:
+        '''
+        Throws the replica away, next refresh downloads the whole directory again
+        '''
+        self.series = None
+        self.iterator = 0
+        self._users.clear()
+        self._owners.clear()
+
+    def refresh(self) -> int:
+        '''
+        Pulls changes made on the device since the last refresh. Created and updated users
+        are stored, users flagged as deleted are dropped. When the device reports different
+        series (e.g. after factory reset), the replica is rebuilt from scratch.
+
+        :return: Number of changed directory entries.
+        '''
+        changes = 0
+        while True:
+            rsp = self.directory.post_query(self.fields, iterator=self.iterator)
+            if rsp.get('series') != self.series:
+                if self.series is not None:
+                    # directory was reset on the device, local data are no longer valid
+                    self.clear()
+                    changes = 0
+                    continue
+                self.series = rsp.get('series')
+            users = rsp.get('users', [])
+            if not users:
+                return changes
+            for user in users:
+                self._apply(user)
+            changes += len(users)
+            next_iterator = ApiDir.next_iterator(rsp)
+            if next_iterator <= self.iterator:
+                return changes
+            self.iterator = next_iterator
+
+    def _apply(self, user: dict[str, Any]) -> None:
+        uuid = user['uuid']
+        old = self._users.pop(uuid, None)
+        if old is not None and 'owner' in old:
+            self._owners[old['owner']].pop(uuid, None)
+        if user.get('deleted'):
+            return
+        self._users[uuid] = user
+        if 'owner' in user:
+            self._owners.setdefault(user['owner'], {})[uuid] = None
+
+    def get(self, uuid: str) -> Optional[dict]:
+        '''
+        :param uuid: UUID of the user
+        :return: Mirrored user dictionary or None, when the user is not in directory.
+        '''
+        return self._users.get(uuid)
+
+    def by_owner(self, owner: str) -> list[dict]:
+        '''
+        :param owner: owner of the users
+        :return: List of mirrored users with specified owner.
+        '''
+        return [self._users[uuid] for uuid in self._owners.get(owner, ())]
+
+    @property
+    def users(self) -> list[dict]:
+        '''
+        All mirrored users, in the order they were received from the device
+        '''
+        return list(self._users.values())
@@ -0,0 +1,142 @@
+from dataclasses import dataclass, field
+from typing import Optional, Any
+from hippy.hip.api.dir import ApiDir
+from hippy.hip.api.dir_bulk import DirBulk
+
+# fields maintained by the device, never sent in update
+READONLY_FIELDS = ('uuid', 'timestamp', 'deleted')
+
+
+@dataclass
+class DirPlan:
+    create: list = field(default_factory=list)
+    update: list = field(default_factory=list)
+    delete: list = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        '''
+        Returns True when the directory is already in desired state.
+        '''
+        return not (self.create or self.update or self.delete)
+
+
+class DirReconciler:
+    '''
+    This class brings device directory to desired state with the smallest set of changes.
+    Desired users are compared field by field with current directory, only missing users
+    are created, only changed fields are updated and only redundant users are deleted.
+    Current directory is read by one query per page, plus a closing empty query unless
+    ApiDir.query_page_size is set; unchanged re-apply sends no writes.
+
+    '''
+
+    def __init__(self, directory: ApiDir, bulk: Optional[DirBulk] = None) -> None:
+        '''
+        Construct reconciler
+
+        :param directory: Instance of ApiDir
+        :param bulk: Optional instance of DirBulk used for writes. By default one with default limits is created.
+        :return: None
+        '''
+        self.directory: ApiDir = directory
+        self.bulk: DirBulk = bulk or DirBulk(directory)
+        self._template: Optional[dict] = None
+
+    @property
+    def template(self) -> dict:
+        '''
+        User template of the device, requested only when a field has to be reset to its default value
+        '''
+        if self._template is None:
+            self._template = self.directory.get_template()['users'][0]
+        return self._template
+
+    def current(self) -> dict[str, dict]:
+        '''
+        :return: Current directory users with non-default fields, indexed by uuid.
+        '''
+        return {user['uuid']: user for user in self.directory.iter_query()}
+
+    def plan(self, desired: list[dict], current: Optional[dict[str, dict]] = None,
+             owner: Optional[str] = None, delete: bool = False) -> DirPlan:
+        '''
+        Computes changes needed to reach desired directory state.
+
+        :param desired: list of users in the form accepted by put_create, uuid is mandatory
+        :param current: current users indexed by uuid, as returned by current(). Queried when omitted.
+        :param owner: when set, only current users of this owner are considered for deletion
+        :param delete: delete current users missing in desired list. Without owner, this means every
+        user of the directory not listed in desired, so it has to be requested explicitly
+        :return: DirPlan with users to be created, partial users to be updated and uuids to be deleted
+        '''
+        if current is None:
+            current = self.current()
+        plan = DirPlan()
+        for user in desired:
+            existing = current.get(user['uuid'])
+            if existing is None:
+                plan.create.append(user)
+                continue
+            changes = self.diff(existing, user, self.template if self._needs_reset(existing, user) else {})
+            if changes:
+                plan.update.append({'uuid': user['uuid'], **changes})
+        if delete:
+            wanted = {user['uuid'] for user in desired}
+            plan.delete = [{'uuid': uuid} for uuid, user in current.items()
+                           if uuid not in wanted and (owner is None or user.get('owner') == owner)]
+        return plan
+
+    def apply(self, desired: list[dict], owner: Optional[str] = None, delete: bool = False) -> DirPlan:
+        '''
+        Computes and sends changes needed to reach desired directory state.
+        Parameters are the same as in plan().
+
+        :return: DirPlan, which has been applied
+        '''
+        plan = self.plan(desired, owner=owner, delete=delete)
+        if plan.create:
+            self.bulk.put_create(plan.create)
+        if plan.update:
+            self.bulk.put_update(plan.update)
+        if plan.delete:
+            self.bulk.put_delete(plan.delete)
+        return plan
+
+    @classmethod
+    def diff(cls, current: dict, desired: dict, defaults: dict) -> dict:
+        '''
+        Returns fields of desired user differing from current one. Nested objects are diffed
+        recursively, arrays are replaced as a whole. Fields present only in current user are
+        reset to their default values from the template.
+
+        :param current: current user fields (non-default values only)
+        :param desired: desired user fields
+        :param defaults: template user, values used for reset
+        :return: Dictionary with changed fields only, empty when users are equal
+        '''
+        changes: dict[str, Any] = {}
+        for name, value in desired.items():
+            if name in READONLY_FIELDS:
+                continue
+            if isinstance(value, dict) and isinstance(current.get(name), dict):
+                nested = cls.diff(current[name], value, defaults.get(name, {}))
+                if nested:
+                    changes[name] = nested
+            elif current.get(name) != value:
+                changes[name] = value
+        for name in current.keys() - desired.keys():
+            if name not in READONLY_FIELDS and name in defaults:
+                changes[name] = defaults[name]
+        return changes
+
+    @classmethod
+    def _needs_reset(cls, current: dict, desired: dict) -> bool:
+        # True when current user has a field, which is not desired and needs to be reset to default
+        for name, value in current.items():
+            if name in READONLY_FIELDS:
+                continue
+            if name not in desired:
+                return True
+            if isinstance(value, dict) and isinstance(desired[name], dict) and cls._needs_reset(value, desired[name]):
+                return True
+        return False
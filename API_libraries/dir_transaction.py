@@ -0,0 +1,62 @@
+import hashlib
+from typing import Optional, Any
+from hippy.hip.api.dir import ApiDir
+
+
+class DirTransaction:
+    '''
+    This class tracks users created within one test (or test class) and removes them afterwards.
+    Every created user without owner is tagged with the transaction owner, so the rollback is a single
+    put_delete(owner=...) request instead of querying and rebuilding the directory. Users created
+    with their own owner are kept as they are and deleted by uuid.
+
+    '''
+
+    def __init__(self, directory: ApiDir, owner: str) -> None:
+        '''
+        Construct directory transaction
+
+        :param directory: Instance of ApiDir
+        :param owner: owner tag of all users created within the transaction
+        :return: None
+        '''
+        self.directory: ApiDir = directory
+        self.owner: str = owner
+        # users created with owner given by the caller, rolled back by uuid
+        self.uuids: list[str] = []
+
+    @classmethod
+    def for_test(cls, directory: ApiDir, nodeid: str) -> 'DirTransaction':
+        '''
+        Returns transaction with short owner tag derived from pytest node id
+        '''
+        return cls(directory, 'T' + hashlib.sha1(nodeid.encode('utf-8')).hexdigest()[:10])
+
+    def put_create(self, users: list[Any], force: Optional[bool] = None) -> dict:
+        '''Creates users, users without owner are tagged with the transaction owner (see ApiDir.put_create)
+
+        :return: Dictionary representing result section of JSON response.
+        '''
+        users = [user if user.get('owner') else {**user, 'owner': self.owner} for user in users]
+        rsp = self.directory.put_create(force=force, users=users)
+        for user, result in zip(users, rsp.get('users', [])):
+            if user['owner'] != self.owner and 'errors' not in result:
+                self.uuids.append(result['uuid'])
+        return rsp
+
+    def rollback(self) -> dict:
+        '''Deletes all users owned by the transaction and users created with other owners
+
+        :return: Dictionary representing result section of JSON response.
+        '''
+        rsp = self.directory.put_delete(owner=self.owner)
+        if self.uuids:
+            self.directory.put_delete(users=[{'uuid': uuid} for uuid in self.uuids])
+            self.uuids.clear()
+        return rsp
+
+    def __enter__(self) -> 'DirTransaction':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.rollback()
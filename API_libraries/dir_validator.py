@@ -0,0 +1,180 @@
+from collections.abc import Mapping
+from typing import Optional, Any
+from hippy.hip.api.dir import ApiDir
+
+# error codes reported by the device for invalid user fields
+EDIR_FIELD_NAME_UNKNOWN = 'EDIR_FIELD_NAME_UNKNOWN'
+EDIR_FIELD_NOT_AVAILABLE = 'EDIR_FIELD_NOT_AVAILABLE'
+EDIR_FIELD_VALUE_ERROR = 'EDIR_FIELD_VALUE_ERROR'
+EDIR_UUID_IS_MISSING = 'EDIR_UUID_IS_MISSING'
+
+# accepted value types of user fields by dotted path. Template values don't tell the type reliably,
+# e.g. validFrom is '0' in templates, while the device accepts timestamp as number as well.
+# Fields missing here are checked against the type of their template value
+FIELD_TYPES: dict[str, tuple[type, ...]] = {
+    'uuid': (str,),
+    'deleted': (bool,),
+    'owner': (str,),
+    'name': (str,),
+    'photo': (str,),
+    'email': (str,),
+    'treepath': (str,),
+    'virtNumber': (str,),
+    'deputy': (str,),
+    'buttons': (str,),
+    'highlighting': (bool,),
+    'recordType': (int,),
+    'timestamp': (int,),
+    'callPos.peer': (str,),
+    'callPos.profiles': (str,),
+    'callPos.grouped': (bool,),
+    'callPos.ipEye': (str,),
+    'access.pin': (str,),
+    'access.code': (str,),
+    'access.card': (str,),
+    'access.virtCard': (str,),
+    'access.mobkey': (str,),
+    'access.fpt': (str,),
+    'access.licensePlates': (str,),
+    'access.liftFloors': (str,),
+    'access.validFrom': (str, int),
+    'access.validTo': (str, int),
+    'access.accessException': (bool,),
+    'access.pairingExpired': (bool,),
+    'access.accessPoints.enabled': (bool,),
+    'access.accessPoints.profiles': (str,),
+}
+
+# paths of all fields existing on any model, including nested objects (e.g. 'access', 'access.card')
+KNOWN_FIELDS: set[str] = {'.'.join(path.split('.')[:depth])
+                          for path in FIELD_TYPES for depth in range(1, path.count('.') + 2)}
+
+
+class DirValidator:
+    '''
+    This class validates directory users locally against the user template of a device model.
+    The template is compiled once into a schema of field names, nesting and array lengths,
+    value types are taken from FIELD_TYPES; errors are reported with the same codes as /api/dir/validate.
+
+    '''
+
+    # compiled validators by (source, model), shared by all callers testing the same model
+    _cache: dict[tuple[str, str], 'DirValidator'] = {}
+
+    def __init__(self, template: Mapping[str, Any], known_fields: Optional[set[str]] = None) -> None:
+        '''
+        Construct validator
+
+        :param template: user template, as returned in users section of /api/dir/template
+        :param known_fields: optional set of field paths (e.g. 'access.card') existing on any model.
+        Fields from the set missing in template are reported as EDIR_FIELD_NOT_AVAILABLE,
+        other missing fields as EDIR_FIELD_NAME_UNKNOWN.
+        :return: None
+        '''
+        self.schema: Any = self._compile(template)
+        self.known_fields: set[str] = known_fields or set()
+
+    @classmethod
+    def from_templates(cls, templates: Mapping[str, Any], model: str) -> 'DirValidator':
+        '''
+        Returns cached validator of the model, compiled from templates dictionary
+        (see Tests/dir/dir_templates.py). Only template of the model is loaded, fields of other models
+        are known from KNOWN_FIELDS.
+        '''
+        key = ('templates', model)
+        if key not in cls._cache:
+            cls._cache[key] = cls(templates[model][0], KNOWN_FIELDS)
+        return cls._cache[key]
+
+    @classmethod
+    def from_device(cls, directory: ApiDir, model: str, known_fields: Optional[set[str]] = None) -> 'DirValidator':
+        '''
+        Returns cached validator of the model, compiled from /api/dir/template of given device.
+        '''
+        key = ('device', model)
+        if key not in cls._cache:
+            cls._cache[key] = cls(directory.get_template()['users'][0], known_fields)
+        return cls._cache[key]
+
+    @classmethod
+    def field_paths(cls, template: Mapping[str, Any], prefix: str = '') -> set[str]:
+        '''
+        :return: Set of dotted paths of all fields in template, e.g. {'name', 'access', 'access.card'}
+        '''
+        paths = set()
+        for name, value in template.items():
+            path = prefix + name
+            paths.add(path)
+            if isinstance(value, (list, tuple)) and value:
+                value = value[0]
+            if isinstance(value, Mapping):
+                paths |= cls.field_paths(value, path + '.')
+        return paths
+
+    @classmethod
+    def _compile(cls, value: Any, path: str = '') -> Any:
+        # dict -> {name: schema}, list -> [max length, item schema], scalar -> tuple of accepted types
+        if isinstance(value, Mapping):
+            return {name: cls._compile(item, path + name + '.') for name, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            item_schema = cls._compile(value[0], path) if value else FIELD_TYPES.get(path.rstrip('.'), (str,))
+            return [len(value), item_schema]
+        return FIELD_TYPES.get(path.rstrip('.'), (type(value),))
+
+    def validate_user(self, user: dict[str, Any], uuid_required: bool = False) -> list[dict]:
+        '''
+        Validates single user
+
+        :param user: user fields and values
+        :param uuid_required: report EDIR_UUID_IS_MISSING when uuid is not present (update, delete)
+        :return: List of errors in the format of per-user errors returned by device. Empty when user is valid.
+        '''
+        errors: list[dict] = []
+        if uuid_required and 'uuid' not in user:
+            errors.append({'code': EDIR_UUID_IS_MISSING})
+        self._check(self.schema, user, '', errors)
+        return errors
+
+    def validate(self, users: list[dict], uuid_required: bool = False) -> dict:
+        '''
+        Validates list of users
+
+        :return: Dictionary shaped as result section of create/update response:
+        users in input order, with 'errors' list for each invalid user.
+        '''
+        result = []
+        for user in users:
+            item: dict[str, Any] = {'uuid': user.get('uuid', '')}
+            errors = self.validate_user(user, uuid_required)
+            if errors:
+                item['errors'] = errors
+            result.append(item)
+        return {'users': result}
+
+    def valid_users(self, users: list[dict], uuid_required: bool = False) -> list[dict]:
+        '''
+        :return: Users passing local validation, bad payloads are dropped.
+        '''
+        return [user for user in users if not self.validate_user(user, uuid_required)]
+
+    def _check(self, schema: Any, value: Any, path: str, errors: list[dict]) -> None:
+        if isinstance(schema, dict):
+            if not isinstance(value, dict):
+                errors.append({'code': EDIR_FIELD_VALUE_ERROR, 'field': path.rstrip('.')})
+                return
+            for name, item in value.items():
+                field = path + name
+                if name not in schema:
+                    code = EDIR_FIELD_NOT_AVAILABLE if field in self.known_fields else EDIR_FIELD_NAME_UNKNOWN
+                    errors.append({'code': code, 'field': field})
+                else:
+                    self._check(schema[name], item, field + '.', errors)
+        elif isinstance(schema, list):
+            length, item_schema = schema
+            if not isinstance(value, list) or len(value) > length:
+                errors.append({'code': EDIR_FIELD_VALUE_ERROR, 'field': path.rstrip('.')})
+                return
+            for item in value:
+                self._check(item_schema, item, path, errors)
+        elif not isinstance(value, schema) or (isinstance(value, bool) and bool not in schema):
+            errors.append({'code': EDIR_FIELD_VALUE_ERROR, 'field': path.rstrip('.')})
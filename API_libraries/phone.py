@@ -1,12 +1,26 @@
-from typing import Optional, Any
+from typing import Optional, Any, Iterator, NamedTuple
 from hippy.hip.device import HipDevice
 
 # TODO: further endpoints methods to be implemenetd within ApiPhone class:
 # GET phone/dtmf
-# GET phone/calllog
 # DELETE phone/calllog
 
 
+class CallLogRecord(NamedTuple):
+    '''Compact record of one call log entry'''
+    id: int
+    direction: Optional[str]
+    state: Optional[str]
+    peer: Optional[str]
+    time: Optional[int]
+    duration: Optional[int]
+
+    @classmethod
+    def from_dict(cls, call: dict[str, Any]) -> 'CallLogRecord':
+        return cls(call['id'], call.get('direction'), call.get('state'), call.get('peer'),
+                   call.get('time'), call.get('duration'))
+
+
 class ApiPhone:
     '''
     This class is a wrapper around phone API.
@@ -20,6 +34,8 @@ class ApiPhone:
         :return None
         '''
         self.device: HipDevice = device
+        # id of the last call log entry read by iter_calllog
+        self.calllog_cursor: Optional[int] = None
 
     def get_status(self, account: Optional[int]) -> dict:
         '''requests info about sip accounts state
@@ -36,3 +52,34 @@ class ApiPhone:
         return HipDevice.api_process_json_result(
             self.device.api_request(method, '/api/phone/status', params=params)
         )
+
+    def get_calllog(self, id: Optional[int] = None) -> dict:
+        '''requests call log of the device
+        :param id: return only entries with id greater than given one
+        :return: Dictionary representing result section of JSON response.
+        '''
+        return self._calllog(id)
+
+    def _calllog(self, id: Optional[int] = None, *, method: str = "GET") -> dict:
+        params: dict[str, Any] = dict()
+        if id is not None:
+            params['id'] = id
+
+        return HipDevice.api_process_json_result(
+            self.device.api_request(method, '/api/phone/calllog', params=params)
+        )
+
+    def iter_calllog(self, reset: bool = False) -> Iterator[CallLogRecord]:
+        '''yields call log entries added since the previous call on this instance.
+        The id of the last seen entry is remembered, so only newer records are requested from the device.
+        :param reset: forget the remembered cursor and read the whole call log
+        :return: Iterator over CallLogRecord items, ordered by id
+        '''
+        if reset:
+            self.calllog_cursor = None
+        rsp = self._calllog(self.calllog_cursor)
+        for call in sorted(rsp.get('calls', []), key=lambda call: call['id']):
+            if self.calllog_cursor is not None and call['id'] <= self.calllog_cursor:
+                continue    # device ignoring the id parameter
+            self.calllog_cursor = call['id']
+            yield CallLogRecord.from_dict(call)
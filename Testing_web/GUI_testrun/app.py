@@ -1,16 +1,13 @@
-from multiprocessing.connection import Connection
 from flask import Flask, render_template, make_response
 from flask import redirect, request, jsonify, url_for
-import pytest
-import multiprocessing
-from multiprocessing import Pipe
-from multiprocessing.connection import Connection
 import socket
 from init_db import DataModel
 from constants import *
 from werkzeug import Response
 from waitress import serve
 from pathlib import Path
+from hippy.hip.api.device_facts import DeviceFacts
+from job_manager import JobManager
 
 
 app = Flask(__name__)
@@ -23,12 +20,8 @@ s.close()
 
 root_dir = str(Path(__file__).parent.parent)
 
-# dict to hold devices testrun statuses
-testruns: dict = {}
-
-# Pipe() returns two connection object connected by a pipe
-# Allows to receive and update global variable within processes
-submit_results, process_results = Pipe()
+# testruns are queued as jobs and run in a bounded pool of processes, one testrun per device at a time
+jobs = JobManager(max_parallel_runs)
 
 # generate database and display its data  on main page
 
@@ -51,7 +44,7 @@ the data from user inputs and passed it to the backend. Data are pytestArgs, dev
 
 @app.route("/postmethod", methods=['POST'])
 def post_javascript_data() -> list[str]:
-    pytestArgs: list[str] = ['-v']
+    pytestArgs: list[str] = ['-v', f'--device-facts={device_facts_path}']
     for key, value in request.form.items():
         match key:
             case 'dev_id':
@@ -62,41 +55,39 @@ def post_javascript_data() -> list[str]:
             case _:
                 pytestArgs.append(value)
     print(pytestArgs)
-    global testruns
-    # Change device testrun status to 'in progress'
+    # testrun waits in queue until a worker is free and the device is not used by another testrun
+    jobs.submit(dev_id, pytestArgs)
 
-    testruns[dev_id] = 'in progress'
+    return pytestArgs
 
-    # each testrun will be set up as an instance of multiprocessing.Process
-    process = multiprocessing.Process(target=pytest_run, args=(pytestArgs, dev_id, submit_results))
-    process.start()
+# /STATUS route is used by AJAX requests, sent every 10s to receive testrun status update for each testrun.
 
-    return pytestArgs
 
-# the target function for Processes. Runs the tests and informs the backend about the end of testrun
-# using standard post reqest with device id and tesrun status ('completed') as url parametres.
+@app.route('/status', methods=['GET'])
+def process_status() -> dict:
+    """ Return the status (queued, running, completed, failed) of the last testrun of each device """
+    return jobs.statuses()
+
+# /JOB route returns full state of one testrun: status, exit code, duration.
+# testrun is identified by job id or by device id (the last testrun of the device)
 
 
-def pytest_run(pytestArgs: list[str], dev_id: str, results: Connection) -> None:
-    '''
-    :pytestArgs: pytest arguments to be passed when initializing a testrun
-    :dev_id: the id of the device used for the restrun
-    :results: connection object, used for updating testrun status. When testrun on the device is completed,
-    its status will be set up to "completed".
-    '''
-    pytest.main(pytestArgs)
-    results.send({dev_id: 'completed'})
+@app.route('/job', methods=['GET'])
+def job_status() -> dict:
+    if 'id' in request.args:
+        job = jobs.get(int(request.args['id']))
+    else:
+        job = jobs.latest_job(request.args['dev_id'])
+    return job.as_dict() if job else {}
 
-# /STATUS route is used by AJAX requests, sent every 10s to receive testrun status update for each testrun.
+# /DEVICE_INFO route returns device info cached by test runs (see --device-facts), device is not contacted
 
 
-@app.route('/status', methods=['GET'])
-def process_status() -> dict:
-    """ Return the status of the worker process """
-    if process_results.poll(timeout=0.1):
-        result: dict = process_results.recv()
-        testruns.update(result)
-    return testruns
+@app.route('/device_info', methods=['GET'])
+def device_info() -> dict:
+    # file is re-read on each request, it is updated by testrun processes
+    info = DeviceFacts(device_facts_path).cached(request.args['ip'])
+    return info or {}
 
 # # # ----------------------------------------------------------
 
@@ -10,6 +10,13 @@ report_dir_path = os.path.join(os.sep, root_dir, 'GUI_testrun', 'static')
 
 db_schema_path = os.path.join(os.sep, root_dir, 'GUI_testrun', 'schema.sql')
 
+# device info cached by test runs (pytest --device-facts=...) and displayed by the GUI through /device_info.
+# kept outside static folder, which is served publicly
+device_facts_path = os.path.join(os.sep, root_dir, 'GUI_testrun', 'device_facts.json')
+
+# maximum number of testruns running at once, other runs wait in job manager queue
+max_parallel_runs: int = 4
+
 polygon_devices: list[tuple] = [
     (1, '10.27.52.108', 'Base', '2n', 'beta', '10.27.58.82'),
     (2, '10.27.52.109', 'Base', '2n', 'beta', '10.27.58.82'),
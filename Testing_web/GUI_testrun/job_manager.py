@@ -0,0 +1,189 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+import pytest
+from constants import *
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# pytest exit codes of a finished testrun: 0 - all tests passed, 1 - some tests failed.
+# Other codes (interrupted, internal error, usage error, no tests collected) mean the run itself failed
+COMPLETED_EXIT_CODES = (int(pytest.ExitCode.OK), int(pytest.ExitCode.TESTS_FAILED))
+
+
+def run_job(job_id: int, pytest_args: list[str], events: multiprocessing.Queue) -> None:
+    '''
+    the target function for job processes. Runs the tests and reports the exit code to the job manager
+    :job_id: id of the job, returned by JobManager.submit
+    :pytest_args: pytest arguments to be passed when initializing a testrun
+    :events: queue shared by all job processes, drained by the job manager
+    '''
+    exit_code = int(pytest.ExitCode.INTERNAL_ERROR)
+    try:
+        exit_code = int(pytest.main(pytest_args))
+    finally:
+        events.put((job_id, exit_code))
+
+
+def job_device(dev_id: str, pytest_args: list[str]) -> str:
+    '''
+    returns the key used for device mutual exclusion - DUT address from --dut argument, device id otherwise
+    '''
+    for arg in pytest_args:
+        if arg.startswith('--dut='):
+            return arg.split('=', 1)[1]
+    return dev_id
+
+
+@dataclass
+class Job():
+    job_id: int
+    dev_id: str
+    args: list[str]
+    device: str
+    state: str = QUEUED
+    exit_code: int | None = None
+    queued_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def duration(self) -> float | None:
+        '''duration of the testrun in seconds, None if it has not started yet. Running job returns elapsed time'''
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def as_dict(self) -> dict:
+        return {
+            'job_id': self.job_id,
+            'dev_id': self.dev_id,
+            'device': self.device,
+            'state': self.state,
+            'exit_code': self.exit_code,
+            'queued_at': self.queued_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'duration': self.duration,
+        }
+
+
+class JobManager():
+
+    def __init__(self, max_workers: int = max_parallel_runs, poll_interval: float = 0.5):
+        '''Construct job manager, which runs testruns as processes of a bounded pool
+        :param max_workers: maximum number of testruns running at once, other jobs wait in queue
+        :param poll_interval: how often dispatcher checks job processes, which exited without reporting'''
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.jobs: dict[int, Job] = {}
+        # last submitted job of each device id, used by /status
+        self.latest: dict[str, Job] = {}
+        self.pending: deque[Job] = deque()
+        self.processes: dict[int, multiprocessing.Process] = {}
+        self.busy: set[str] = set()
+        self.events: multiprocessing.Queue = multiprocessing.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._dispatcher: threading.Thread | None = None
+
+    def submit(self, dev_id: str, pytest_args: list[str]) -> Job:
+        '''
+        queues a testrun. It starts as soon as a worker is free and no other job runs on the same device
+        :dev_id: the id of the device row in GUI
+        :pytest_args: pytest arguments to be passed when initializing a testrun
+        '''
+        with self._lock:
+            job = Job(next(self._ids), dev_id, list(pytest_args), job_device(dev_id, pytest_args))
+            self.jobs[job.job_id] = job
+            self.latest[dev_id] = job
+            self.pending.append(job)
+            self._schedule()
+            # dispatcher is started lazily, so processes importing this module do not start their own
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+                self._dispatcher.start()
+        return job
+
+    def get(self, job_id: int) -> Job | None:
+        return self.jobs.get(job_id)
+
+    def latest_job(self, dev_id: str) -> Job | None:
+        return self.latest.get(dev_id)
+
+    def statuses(self) -> dict[str, str]:
+        '''returns state of the last job of each device id'''
+        with self._lock:
+            return {dev_id: job.state for dev_id, job in self.latest.items()}
+
+    def _schedule(self) -> None:
+        # must be called with self._lock held. Jobs of busy devices keep their place in queue
+        if len(self.processes) >= self.max_workers:
+            return
+        waiting: deque[Job] = deque()
+        while self.pending and len(self.processes) < self.max_workers:
+            job = self.pending.popleft()
+            if job.device in self.busy:
+                waiting.append(job)
+                continue
+            self._start(job)
+        waiting.extend(self.pending)
+        self.pending = waiting
+
+    def _start(self, job: Job) -> None:
+        process = multiprocessing.Process(target=run_job, args=(job.job_id, job.args, self.events))
+        job.state = RUNNING
+        job.started_at = time.time()
+        self.busy.add(job.device)
+        self.processes[job.job_id] = process
+        process.start()
+
+    def _finish(self, job_id: int, exit_code: int | None) -> None:
+        # must be called with self._lock held, after the job process was joined
+        process = self.processes.pop(job_id, None)
+        if process is None:
+            return
+        job = self.jobs[job_id]
+        job.exit_code = exit_code if exit_code is not None else process.exitcode
+        job.state = COMPLETED if job.exit_code in COMPLETED_EXIT_CODES else FAILED
+        job.finished_at = time.time()
+        self.busy.discard(job.device)
+
+    def _drain(self, timeout: float) -> list[tuple[int, int]]:
+        # waits for the first event, then takes all events already queued
+        try:
+            events = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _dispatch(self) -> None:
+        while True:
+            # processes found dead before draining, their events (if any) are already in queue
+            with self._lock:
+                dead = [job_id for job_id, process in self.processes.items() if not process.is_alive()]
+            events = self._drain(self.poll_interval)
+            finished = dict(events)
+            # process exited without reporting (killed, crashed) - job is failed with its exit code
+            for job_id in dead:
+                finished.setdefault(job_id, None)
+            with self._lock:
+                processes = [self.processes[job_id] for job_id in finished if job_id in self.processes]
+            # reporting process may still be exiting, join it without the lock, so /status is not blocked
+            for process in processes:
+                process.join()
+            with self._lock:
+                for job_id, exit_code in finished.items():
+                    self._finish(job_id, exit_code)
+                self._schedule()
@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import os
+import sys
+import xml.etree.ElementTree as ET
+import pytest
+from constants import *
+from report_plugin.test_history import TestHistory, group_key
+
+# result counters summed over junit xml reports of pool workers
+JUNIT_COUNTERS = ('tests', 'failures', 'errors', 'skipped')
+# fixture of the device calling the DUT. Pool devices share it, so tests using it must not run in parallel
+SHARED_DEVICE_FIXTURE = 'additional_device'
+
+
+def device_pools(devices: list[tuple]) -> dict[str, list[tuple]]:
+    '''
+    groups polygon devices by model
+    :devices: rows in the format of polygon_devices (id, ip, model, password, firmware, add_device)
+    '''
+    pools: dict[str, list[tuple]] = {}
+    for device in devices:
+        pools.setdefault(device[2], []).append(device)
+    return pools
+
+
+def group_args(key: str, nodeids: list[str]) -> list[str]:
+    '''
+    returns pytest arguments selecting the whole group: class node id, or node ids of module level tests
+    without parameters (module node id would select its classes as well)
+    '''
+    if '::' in key:
+        return [key]
+    return list(dict.fromkeys(nodeid.split('[', 1)[0] for nodeid in nodeids))
+
+
+class NodeIdCollector():
+    '''
+    pytest plugin recording node ids of collected tests and of tests using the shared additional device
+    '''
+
+    def __init__(self):
+        self.nodeids: list[str] = []
+        self.shared: set[str] = set()
+
+    def pytest_collection_finish(self, session):
+        self.nodeids = [item.nodeid for item in session.items]
+        self.shared = {item.nodeid for item in session.items if SHARED_DEVICE_FIXTURE in item.fixturenames}
+
+
+def pool_worker(pytest_args: list[str], report_path: str) -> int:
+    '''
+    the target function for pool processes. Runs assigned tests on one device of the pool
+    '''
+    return int(pytest.main(pytest_args + [f'--junitxml={report_path}']))
+
+
+class PoolScheduler():
+
+    def __init__(self, pool: list[tuple], test_path: str, pytest_args: list[str], report_dir: str = report_dir_path):
+        '''Construct scheduler, which spreads test classes across same-model devices
+        :param pool: devices of the same model, rows in the format of polygon_devices
+        :param test_path: path to tests to be run, e.g. tests/dir
+        :param pytest_args: additional pytest arguments, without --dut and --additional-device
+        :param report_dir: directory for junit xml reports of workers and merged report'''
+        self.pool = pool
+        self.test_path = test_path
+        self.pytest_args = pytest_args
+        self.report_dir = report_dir
+        self.history_path = os.path.join(report_dir, 'test_history.json')
+        # groups using the shared additional device, filled by collect_groups
+        self.shared_groups: set[str] = set()
+
+    def collect_groups(self) -> dict[str, list[str]]:
+        '''
+        collects test node ids grouped by test class (tests outside classes by module).
+        All tests of a group run on one device, so class scoped fixtures (directory, call...) are kept
+        '''
+        collector = NodeIdCollector()
+        exit_code = pytest.main(['--collect-only', '-q', self.test_path, *self.pytest_args, f'--dut={self.pool[0][1]}'],
+                                plugins=[collector])
+        if exit_code != pytest.ExitCode.OK:
+            raise RuntimeError(f'collection of {self.test_path} failed with exit code {int(exit_code)}')
+        groups: dict[str, list[str]] = {}
+        for nodeid in collector.nodeids:
+            groups.setdefault(group_key(nodeid), []).append(nodeid)
+        self.shared_groups = {group_key(nodeid) for nodeid in collector.shared}
+        return groups
+
+    def assign(self, groups: dict[str, list[str]]) -> list[list[str]]:
+        '''
+        spreads groups across pool devices, longest first: the group with the longest expected duration
+        (from test history) goes to the device with the least expected load, so workers finish together.
+        Groups using the shared additional device are kept together on one device, they would race for its calls
+        :return: list of group keys for each device of the pool
+        '''
+        history = TestHistory(self.history_path)
+        units = [[key] for key in groups if key not in self.shared_groups]
+        shared = [key for key in groups if key in self.shared_groups]
+        if shared:
+            units.append(shared)
+
+        def duration(unit: list[str]) -> float:
+            return history.group_duration([nodeid for key in unit for nodeid in groups[key]])
+
+        assignment: list[list[str]] = [[] for _ in self.pool]
+        load = [0.0] * len(self.pool)
+        for unit in sorted(units, key=duration, reverse=True):
+            device = load.index(min(load))
+            assignment[device].extend(unit)
+            load[device] += duration(unit)
+        return assignment
+
+    def run(self) -> dict:
+        '''
+        runs tests on all pool devices in parallel worker processes and merges their results
+        :return: dictionary with per-device exit codes and merged result counters
+        '''
+        groups = self.collect_groups()
+        assignment = self.assign(groups)
+        jobs = []
+        for device, keys in zip(self.pool, assignment):
+            if not keys:
+                continue
+            _, ip, _, password, _, add_device = device
+            selection = [arg for key in keys for arg in group_args(key, groups[key])]
+            args = [f'--dut={ip}', f'--password={password}', f'--additional-device={add_device}',
+                    f'--test-history={self.history_path}', *self.pytest_args, *selection]
+            jobs.append((ip, args, os.path.join(self.report_dir, f'{ip}junit.xml')))
+        with multiprocessing.Pool(processes=len(jobs) or 1, maxtasksperchild=1) as pool:
+            exit_codes = pool.starmap(pool_worker, [(args, report) for _, args, report in jobs])
+        merged = self.merge_reports([report for _, _, report in jobs])
+        return {
+            'devices': {ip: exit_code for (ip, _, _), exit_code in zip(jobs, exit_codes)},
+            **merged,
+        }
+
+    def merge_reports(self, report_paths: list[str]) -> dict:
+        '''
+        merges junit xml reports of workers into one report in report_dir
+        :return: summed result counters
+        '''
+        merged = ET.Element('testsuites')
+        totals = dict.fromkeys(JUNIT_COUNTERS, 0)
+        for path in report_paths:
+            if not os.path.exists(path):
+                continue
+            root = ET.parse(path).getroot()
+            for suite in root.iter('testsuite'):
+                merged.append(suite)
+                for counter in JUNIT_COUNTERS:
+                    totals[counter] += int(suite.get(counter, 0))
+        ET.ElementTree(merged).write(os.path.join(self.report_dir, 'pool_junit.xml'))
+        return totals
+
+
+if __name__ == '__main__':
+    # usage: python pool_scheduler.py <model> <test_path> [pytest args]
+    logging.basicConfig(level=logging.INFO)
+    model, test_path, *args = sys.argv[1:]
+    result = PoolScheduler(device_pools(polygon_devices)[model], test_path, args).run()
+    logging.info('pool run finished: %s', result)
+    sys.exit(max(result['devices'].values(), default=0))
@@ -1,8 +1,56 @@
 import pytest
+import json
+import os
+import threading
+import time
+from functools import wraps
 from py.xml import html
-from hippy.hip.api.system import ApiSystem
+from hippy.hip.api.device_facts import DeviceFacts
+from hippy.hip.api.cassette import CASSETTE_MODES, RecordingDevice, cassette_device, cassette_path
 from hippy.hip.device import HipDevice
 from datetime import datetime
+from tests.shared_func import test_timings
+from report_plugin.test_history import TestHistory
+
+# HipDevice methods measured as device communication time
+TIMED_REQUEST_METHODS = ('api_request', 'api_get', 'api_post', 'api_put')
+
+# per-test timings, written to JSON sidecar of html report at the end of session
+timings_results: dict[str, dict] = {}
+
+_request_depth = threading.local()
+
+
+def timed_request(method):
+    ''' wraps HipDevice request method, so its duration is added to test timings.
+    Nested calls (e.g. api_put calling api_request) are measured only once.'''
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_request_depth, 'value', 0)
+        _request_depth.value = depth + 1
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _request_depth.value = depth
+            if not depth:
+                test_timings.add_http(time.perf_counter() - start)
+    return wrapper
+
+
+def pytest_addoption(parser):
+    parser.addoption('--device-facts', default=None,
+                     help='JSON file with device info cached between runs')
+    parser.addoption('--test-history', default=None,
+                     help='JSON file with durations and outcomes of previous runs, used for test ordering. '
+                          'When omitted, tests keep their order and history is recorded next to html report')
+    parser.addoption('--cassette', choices=CASSETTE_MODES, default=None,
+                     help='record communication with DUT and additional device into cassettes, '
+                          'or replay it from cassettes without the devices')
+    parser.addoption('--cassette-dir', default='cassettes',
+                     help='directory of cassettes, stored as <dut>/<firmware>/<device>.json.gz')
+    parser.addoption('--cassette-firmware', default=None,
+                     help='DUT firmware of the replayed cassettes, e.g. "2.41.0.55.1 beta"')
 
 
 def pytest_html_report_title(report):
@@ -10,12 +58,80 @@ def pytest_html_report_title(report):
     report.title = "Testrun Results"
 
 
+def cassette_for(config, device: HipDevice, name: str):
+    '''
+    returns device recording into or replaying from cassette of given name (see cassette_path),
+    the same instance for the whole session. Without --cassette the device itself is returned
+    '''
+    mode = config.getoption('--cassette')
+    if mode is None:
+        return device
+    if name not in config._cassettes:
+        # recorded firmware is known after DUT info is read, path of DUT cassette is set at collection
+        firmware = config.getoption('--cassette-firmware') if mode == 'replay' else config._dut_firmware
+        path = firmware and cassette_path(config.getoption('--cassette-dir'), config.getoption('--dut'), firmware, name)
+        config._cassettes[name] = cassette_device(device, mode, path, firmware)
+    return config._cassettes[name]
+
+
 def pytest_configure(config):
-    dut = HipDevice(address=config.getoption('--dut'))
-    dut_info = ApiSystem(dut).get_info()
+    # device info is requested in background, while tests are being collected.
+    # With --cassette, the same recording or replaying devices are used by fixtures (see tests/conftest.py)
+    if config.getoption('--cassette') == 'replay' and config.getoption('--cassette-firmware') is None:
+        raise pytest.UsageError('--cassette=replay requires --cassette-firmware')
+    config._cassettes = {}
+    config._dut_firmware = None
+    config._cassette_for = lambda device, name: cassette_for(config, device, name)
+    config._dut = cassette_for(config, HipDevice(address=config.getoption('--dut')), 'dut')
+    DeviceFacts.shared(config.getoption('--device-facts')).prefetch(config._dut)
+    history_path = config.getoption('--test-history')
+    # tests are reordered only when history is requested explicitly (e.g. by pool scheduler)
+    config._order_by_history = history_path is not None
+    html_path = getattr(config.option, 'htmlpath', None)
+    if history_path is None and html_path:
+        history_path = os.path.join(os.path.dirname(os.path.abspath(html_path)), 'test_history.json')
+    config._test_history = TestHistory(history_path) if history_path else None
+    # original methods are restored in pytest_unconfigure, None stands for a method inherited by HipDevice
+    config._untimed_requests = {}
+    for name in TIMED_REQUEST_METHODS:
+        if hasattr(HipDevice, name):
+            config._untimed_requests[name] = vars(HipDevice).get(name)
+            setattr(HipDevice, name, timed_request(getattr(HipDevice, name)))
+
+
+def pytest_unconfigure(config):
+    for device in getattr(config, '_cassettes', {}).values():
+        if isinstance(device, RecordingDevice) and device.cassette.path and not config.option.collectonly:
+            device.save()
+    for name, method in getattr(config, '_untimed_requests', {}).items():
+        if method is None:
+            delattr(HipDevice, name)
+        else:
+            setattr(HipDevice, name, method)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    dut_info = DeviceFacts.shared().get(config._dut)
     config._metadata['DUT'] = config.getoption('--dut')
     config._metadata['DUT Firmware'] = f'{dut_info["swVersion"]} {dut_info["buildType"]}'
     config._metadata['DUT Model'] = dut_info['variant']
+    config._dut_firmware = config._metadata['DUT Firmware']
+    if isinstance(config._dut, RecordingDevice):
+        config._dut.cassette.info['firmware'] = config._dut_firmware
+        config._dut.cassette.path = cassette_path(config.getoption('--cassette-dir'), config.getoption('--dut'),
+                                                  config._dut_firmware, 'dut')
+
+    if not config._order_by_history:
+        return
+    # test classes, which failed recently, run first
+    order = {nodeid: index for index, nodeid in enumerate(config._test_history.order([item.nodeid for item in items]))}
+    items.sort(key=lambda item: order[item.nodeid])
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    test_timings.reset()
 
 
 @pytest.hookimpl(trylast=True)
@@ -24,6 +140,9 @@ def pytest_html_results_table_header(cells):
     #  adding new headers
     cells.insert(3, html.th("Time", class_="sortable time", col="time"))
     cells.insert(4, html.th("Description", col="description"))
+    cells.insert(5, html.th("Wait (s)", class_="sortable numeric", col="wait"))
+    cells.insert(6, html.th("Polls", class_="sortable numeric", col="polls"))
+    cells.insert(7, html.th("HTTP (s)", class_="sortable numeric", col="http"))
     cells.pop()
 
 
@@ -31,6 +150,9 @@ def pytest_html_results_table_header(cells):
 def pytest_html_results_table_row(report, cells):
     cells.insert(3, html.td(datetime.now(), class_="col-time"))
     cells.insert(4, html.td(report.description))
+    cells.insert(5, html.td(f'{getattr(report, "wait_time", 0.0):.2f}', class_="col-wait"))
+    cells.insert(6, html.td(getattr(report, "wait_polls", 0), class_="col-polls"))
+    cells.insert(7, html.td(f'{getattr(report, "http_time", 0.0):.2f}', class_="col-http"))
     cells.pop()
 
 
@@ -40,3 +162,25 @@ def pytest_runtest_makereport(item, call):
     outcome = yield
     report = outcome.get_result()
     report.description = str(item.function.__doc__)
+    # timings are cumulative from the test setup, the last phase holds the totals
+    timings = test_timings.as_dict()
+    for key, value in timings.items():
+        setattr(report, key, value)
+    result = timings_results.setdefault(item.nodeid, {})
+    result.update(timings)
+    if report.when == 'call' or report.failed:
+        result.setdefault('outcome', report.outcome)
+    result['duration'] = result.get('duration', 0.0) + report.duration
+    if report.when == 'teardown' and item.config._test_history is not None:
+        item.config._test_history.record(item.nodeid, result['duration'], result.get('outcome', report.outcome))
+
+
+def pytest_sessionfinish(session):
+    if session.config._test_history is not None and not session.config.option.collectonly:
+        session.config._test_history.save()
+    # timings are written next to html report only, runs without report (e.g. --collect-only) leave no files
+    html_path = getattr(session.config.option, 'htmlpath', None)
+    if not html_path or session.config.option.collectonly:
+        return
+    with open(f'{os.path.splitext(html_path)[0]}.timings.json', 'w') as file:
+        json.dump(timings_results, file, indent=2)
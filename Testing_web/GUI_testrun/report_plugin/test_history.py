@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Optional
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+# number of last outcomes kept for each test
+HISTORY_LENGTH = 10
+# weight of the newest duration in moving average
+DURATION_WEIGHT = 0.3
+
+
+def group_key(nodeid: str) -> str:
+    '''
+    returns test class node id (module node id for tests outside classes).
+    Tests of one group share class scoped fixtures and must run together, in their order
+    '''
+    parts = nodeid.split('[', 1)[0].split('::')
+    return '::'.join(parts[:2]) if len(parts) > 2 else parts[0]
+
+
+class TestHistory():
+    '''
+    Durations and outcomes of tests from previous runs, stored in JSON file:
+    {nodeid: {"duration": moving average (s), "outcomes": ["passed", "failed", ...]}}
+    '''
+    __test__ = False    # not a test class
+
+    def __init__(self, path: str):
+        '''
+        :param path: path to JSON history file, missing file means empty history'''
+        self.path = path
+        self.tests: dict[str, dict] = self._read()
+        self._updated: dict[str, dict] = {}
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def record(self, nodeid: str, duration: float, outcome: str) -> None:
+        '''
+        adds result of one test run
+        '''
+        entry = self.tests.setdefault(nodeid, {'duration': duration, 'outcomes': []})
+        entry['duration'] = DURATION_WEIGHT * duration + (1 - DURATION_WEIGHT) * entry['duration']
+        entry['outcomes'] = (entry['outcomes'] + [outcome])[-HISTORY_LENGTH:]
+        self._updated[nodeid] = entry
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # exclusive lock of sidecar file, held by one worker from re-reading the history until it is replaced
+        with open(f'{self.path}.lock', 'a+') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                else:
+                    lock.seek(0)
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def save(self) -> None:
+        '''
+        writes recorded results. File is re-read under a lock first, so parallel workers saving at the same
+        time don't overwrite each other's tests
+        '''
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._locked():
+            tests = self._read()
+            tests.update(self._updated)
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+                json.dump(tests, f, indent=1)
+            os.replace(f.name, self.path)
+
+    def duration(self, nodeid: str, default: float = 1.0) -> float:
+        entry = self.tests.get(nodeid)
+        return entry['duration'] if entry else default
+
+    def failure_score(self, nodeid: str) -> float:
+        '''
+        weighted share of failed runs, the latest runs weigh the most (0 - never failed, 1 - always failed)
+        '''
+        entry = self.tests.get(nodeid)
+        if not entry or not entry['outcomes']:
+            return 0.0
+        weights = range(1, len(entry['outcomes']) + 1)
+        failed = sum(weight for weight, outcome in zip(weights, entry['outcomes']) if outcome == 'failed')
+        return failed / sum(weights)
+
+    def group_duration(self, nodeids: list[str], default: Optional[float] = None) -> float:
+        '''
+        expected duration of tests, unknown tests take average duration of known ones
+        '''
+        known = [self.tests[nodeid]['duration'] for nodeid in nodeids if nodeid in self.tests]
+        if default is None:
+            default = sum(known) / len(known) if known else 1.0
+        return sum(known) + default * (len(nodeids) - len(known))
+
+    def order(self, nodeids: list[str]) -> list[str]:
+        '''
+        orders test groups (classes) so that the groups most likely to fail run first.
+        Order of tests inside a group is kept
+        '''
+        groups: dict[str, list[str]] = {}
+        for nodeid in nodeids:
+            groups.setdefault(group_key(nodeid), []).append(nodeid)
+        ordered = sorted(groups.values(), key=lambda group: -max(map(self.failure_score, group)))
+        return [nodeid for group in ordered for nodeid in group]
@@ -15,13 +15,17 @@ window.onload =  function() {
         function(data) {
             console.log(data);
             for (let key in data) {
-                if (data[key] == 'completed') {
+                // 'failed' testrun (interrupted, internal error) is finished as well
+                if (data[key] == 'completed' || data[key] == 'failed') {
                     let dev_id = key
                     let button = $(`.start-btn.${dev_id}`)[0]
                     let statusIcon = $(`.status.${dev_id}`)[0]
                     if (statusIcon.getElementsByTagName('i').length > 0 ) {
-                        statusIcon.getElementsByTagName('i')
-                        testrunCompleted(statusIcon, button)
+                        if (data[key] == 'failed') {
+                            testrunFailed(statusIcon, button)
+                        } else {
+                            testrunCompleted(statusIcon, button)
+                        }
                     }
                     };
                 };
@@ -33,7 +37,7 @@ window.onload =  function() {
 
 function testRunStart(statusIcon, button) {
     button.disabled = true
-    statusIcon.classList.remove('circle-green');
+    statusIcon.classList.remove('circle-green', 'circle-red');
     if (statusIcon.getElementsByTagName('span').length> 0) {
         let resultCheckmark = statusIcon.getElementsByTagName('span')[0];
         statusIcon.removeChild(resultCheckmark)
@@ -46,13 +50,22 @@ function testRunStart(statusIcon, button) {
 // add testrun 'Passed' icon when tesrun is finished
 //TODO: add 'Failed' icon, to show either Passed or Failed icon for each testrun according to its result
 function testrunCompleted(statusIcon, button) {
+    testrunFinished(statusIcon, button, 'circle-green', 'check')
+}
+
+// add testrun 'Failed' icon when testrun could not finish (interrupted, internal error)
+function testrunFailed(statusIcon, button) {
+    testrunFinished(statusIcon, button, 'circle-red', 'close')
+}
+
+function testrunFinished(statusIcon, button, circleClass, symbol) {
     button.disabled = false
     let i = statusIcon.getElementsByTagName('i')[0]
     statusIcon.removeChild(i)
-    statusIcon.classList.add('circle-green')
+    statusIcon.classList.add(circleClass)
     let newSpan= document.createElement('span');
     let resultCheckmark = statusIcon.appendChild(newSpan)
-    resultCheckmark.innerHTML = 'check';
+    resultCheckmark.innerHTML = symbol;
     resultCheckmark.classList.add('material-symbols-outlined')
 }
 
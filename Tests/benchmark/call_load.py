@@ -0,0 +1,193 @@
+'''
+Concurrent call-load generator.
+
+Drives dial -> answer -> hangup cycles on several device pairs in parallel and records
+dial-to-ringing, ringing-to-answered and hangup-to-idle latencies. Reports throughput
+(calls per minute), latency percentiles and histograms as JSON, e.g.:
+
+    python -m tests.benchmark.call_load --pair 10.27.58.82,10.27.52.108 --cycles 50
+    python -m tests.benchmark.call_load --simulate 8 --cycles 50
+'''
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from hippy.hip.device import HipDevice
+from hippy.hip.api.call import ApiCall
+from tests.benchmark.dir_benchmark import percentile
+from tests.benchmark.hip_simulator import HipSimulator
+
+# interval (seconds) between status polls while waiting for a session state
+POLL_PERIOD = 0.05
+# maximum time (seconds) for one phase of a call
+PHASE_TIMEOUT = 30
+DEFAULT_CYCLES = 10
+# upper bounds (ms) of histogram buckets, the last bucket is unbounded
+HISTOGRAM_BUCKETS_MS = [50, 100, 200, 500, 1000, 2000, 5000, 10000]
+PHASES = ('dial_to_ringing', 'ringing_to_answered', 'hangup_to_idle')
+
+
+class LatencyRecorder:
+    '''
+    Thread safe collection of latency samples of individual call phases
+    '''
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: dict[str, list[float]] = {phase: [] for phase in PHASES}
+        self.calls = 0
+        self.failures: list[str] = []
+        # errors while returning devices to idle after failed cycle, per 'caller->callee' pair
+        self.recovery_errors: dict[str, int] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.samples[phase].append(seconds)
+
+    def add_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def add_failure(self, reason: str) -> None:
+        with self._lock:
+            self.failures.append(reason)
+
+    def add_recovery_error(self, pair: str) -> None:
+        with self._lock:
+            self.recovery_errors[pair] = self.recovery_errors.get(pair, 0) + 1
+
+    def histogram(self, phase: str) -> dict[str, int]:
+        buckets = {f'<={bound}ms': 0 for bound in HISTOGRAM_BUCKETS_MS}
+        buckets[f'>{HISTOGRAM_BUCKETS_MS[-1]}ms'] = 0
+        for sample in self.samples[phase]:
+            ms = sample * 1000
+            key = next((f'<={bound}ms' for bound in HISTOGRAM_BUCKETS_MS if ms <= bound),
+                       f'>{HISTOGRAM_BUCKETS_MS[-1]}ms')
+            buckets[key] += 1
+        return buckets
+
+    def summary(self, seconds: float) -> dict[str, Any]:
+        phases: dict[str, Any] = {}
+        for phase, samples in self.samples.items():
+            if not samples:
+                continue
+            phases[phase] = {
+                'count': len(samples),
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p95_ms': percentile(samples, 95) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+                'max_ms': max(samples) * 1000,
+                'histogram': self.histogram(phase),
+            }
+        return {
+            'calls': self.calls,
+            'failures': len(self.failures),
+            'failure_reasons': self.failures[:20],
+            'recovery_errors': dict(self.recovery_errors),
+            'seconds': seconds,
+            'calls_per_minute': self.calls / seconds * 60 if seconds else 0.0,
+            'phases': phases,
+        }
+
+
+def poll(func: Callable[[], Any], timeout: float = PHASE_TIMEOUT) -> Any:
+    '''polls func until it returns a truthy value, returns that value'''
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        out = func()
+        if out:
+            return out
+        time.sleep(POLL_PERIOD)
+    raise TimeoutError(f'condition not met within {timeout}s')
+
+
+def session_in_state(call: ApiCall, states: tuple[str, ...]) -> Optional[dict]:
+    return next((item for item in call.get_status()['sessions'] if item.get('state') in states), None)
+
+
+def call_cycle(caller: ApiCall, callee: ApiCall, callee_address: str, recorder: LatencyRecorder) -> None:
+    '''one dial -> answer -> hangup cycle from caller to callee'''
+    t_dial = time.monotonic()
+    caller.post_dial(number=f'sip:{callee_address}')
+    session = poll(lambda: session_in_state(callee, ('ringing',)))
+    t_ringing = time.monotonic()
+    recorder.add('dial_to_ringing', t_ringing - t_dial)
+
+    callee.post_answer(session=session['session'])
+    poll(lambda: session_in_state(callee, ('connected',)))
+    recorder.add('ringing_to_answered', time.monotonic() - t_ringing)
+
+    t_hangup = time.monotonic()
+    callee.post_hangup(session=session['session'])
+    poll(lambda: not callee.get_status()['sessions'] and not caller.get_status()['sessions'])
+    recorder.add('hangup_to_idle', time.monotonic() - t_hangup)
+    recorder.add_call()
+
+
+def run_pair(caller_address: str, callee_address: str, cycles: int, recorder: LatencyRecorder) -> None:
+    caller = ApiCall(HipDevice(caller_address, ssl=False))
+    callee = ApiCall(HipDevice(callee_address, ssl=False))
+    pair = f'{caller_address}->{callee_address}'
+    for _ in range(cycles):
+        try:
+            call_cycle(caller, callee, callee_address, recorder)
+        except Exception as e:
+            # any error fails only this cycle, so the load run finishes and writes its report
+            recorder.add_failure(f'{pair}: {type(e).__name__}: {e}')
+            recover(caller, callee, pair, recorder)
+
+
+def recover(caller: ApiCall, callee: ApiCall, pair: str, recorder: LatencyRecorder) -> None:
+    '''
+    hangs up all sessions to leave both devices idle before next cycle. Errors are counted per pair,
+    so unreachable device does not stop the pair and the whole load run
+    '''
+    for device in (caller, callee):
+        try:
+            sessions = device.get_status()['sessions']
+        except Exception:
+            recorder.add_recovery_error(pair)
+            continue
+        for item in sessions:
+            try:
+                device.post_hangup(session=item['session'])
+            except Exception:
+                recorder.add_recovery_error(pair)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--pair', action='append',
+                        help='CALLER,CALLEE device addresses, can be used multiple times')
+    target.add_argument('--simulate', type=int, metavar='PAIRS', help='run against given number of simulated pairs')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulator latency (s) per request')
+    parser.add_argument('--cycles', type=int, default=DEFAULT_CYCLES, help='number of calls per pair')
+    parser.add_argument('--output', default='-', help='output JSON file, stdout by default')
+    args = parser.parse_args(argv)
+
+    if args.simulate:
+        args.pair = [f'{HipSimulator(latency=args.latency).start()},{HipSimulator(latency=args.latency).start()}'
+                     for _ in range(args.simulate)]
+    pairs = [tuple(pair.split(',')) for pair in args.pair]
+    recorder = LatencyRecorder()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(pairs)) as executor:
+        for future in [executor.submit(run_pair, caller, callee, args.cycles, recorder) for caller, callee in pairs]:
+            future.result()
+    report = {'pairs': args.pair, 'cycles': args.cycles, **recorder.summary(time.monotonic() - start)}
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,182 @@
+'''
+Directory throughput benchmark.
+
+Measures ops/sec and p50/p95/p99 latency of /api/dir/* endpoints for growing directory sizes
+and writes the results as JSON, so they can be compared across firmware builds. Every size is
+measured in several passes; percentiles not supported by the number of samples are reported as null.
+Users rejected by the device (e.g. over directory capacity) are reported as errors and excluded from ops/sec.
+Runs against a real DUT or a local device stand-in, e.g.:
+
+    python -m tests.benchmark.dir_benchmark --dut 10.27.52.108 --output dir_benchmark.json
+    python -m tests.benchmark.dir_benchmark --simulator vario --output dir_benchmark.json
+'''
+import argparse
+import json
+import math
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable
+from hippy.hip.device import HipDevice
+from hippy.hip.api.dir import ApiDir
+from hippy.hip.api.device_facts import DeviceFacts
+from tests.benchmark.hip_simulator import HipSimulator
+
+# owner of all users created by the benchmark, used for cleanup
+BENCH_OWNER = 'BENCHMARK'
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_REPEAT = 20
+
+
+def percentile(samples: list[float], p: float) -> float:
+    '''nearest-rank percentile of given samples'''
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def min_samples(p: float) -> int:
+    '''number of samples needed for p-th percentile to differ from the maximum'''
+    return math.ceil(100 / (100 - p))
+
+
+def generate_users(size: int) -> list[dict]:
+    return [
+        {
+            'uuid': str(uuid.UUID(int=i + 1)),
+            'owner': BENCH_OWNER,
+            'name': f'bench{i}',
+            'callPos': [{'peer': str(1000 + i)}],
+        }
+        for i in range(size)
+    ]
+
+
+def batches(items: list, batch_size: int) -> list[list]:
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+class Measurement:
+    '''
+    Latencies of one operation collected over several passes
+    '''
+
+    def __init__(self, operation: str, size: int) -> None:
+        '''
+        :param operation: name of measured operation
+        :param size: directory size the operation runs with
+        '''
+        self.operation = operation
+        self.size = size
+        self.latencies: list[float] = []
+        self.users = 0
+        # users rejected by the device (per-user errors in responses), not counted in ops_per_sec
+        self.errors = 0
+
+    def run(self, requests: list[Callable[[], Any]], users: int) -> None:
+        '''
+        Calls each request once, every request is one latency sample
+
+        :param requests: list of callables, each of them representing one measured sample
+        :param users: total number of users processed by all requests
+        '''
+        for request in requests:
+            t = time.perf_counter()
+            rsp = request()
+            self.latencies.append(time.perf_counter() - t)
+            if isinstance(rsp, dict):
+                self.errors += sum(1 for user in rsp.get('users', []) if 'errors' in user)
+        self.users += users
+
+    def result(self) -> dict:
+        '''
+        Returns throughput and latency statistics. Percentiles, which can't be told apart
+        from the maximum with the number of samples taken ('requests'), are None
+        '''
+        total = sum(self.latencies)
+        result = {
+            'operation': self.operation,
+            'size': self.size,
+            'requests': len(self.latencies),
+            'users': self.users,
+            'errors': self.errors,
+            'seconds': total,
+            'ops_per_sec': (self.users - self.errors) / total if total else 0.0,
+            'requests_per_sec': len(self.latencies) / total if total else 0.0,
+        }
+        for p in (50, 95, 99):
+            enough = len(self.latencies) >= min_samples(p)
+            result[f'p{p}_ms'] = percentile(self.latencies, p) * 1000 if enough else None
+        return result
+
+
+def walk(directory: ApiDir, fields: Any) -> None:
+    for _ in directory.iter_query_chunks(fields):
+        pass
+
+
+def run_size(directory: ApiDir, size: int, batch_size: int, repeat: int) -> list[dict]:
+    '''
+    Runs `repeat` passes of create, update, query, get and delete of `size` users.
+    Every pass ends with an empty benchmark directory, so the next one starts from the same state
+    '''
+    users = generate_users(size)
+    user_batches = batches(users, batch_size)
+    uuid_batches = [[{'uuid': user['uuid']} for user in batch] for batch in user_batches]
+    updated_batches = [[{'uuid': user['uuid'], 'name': f"{user['name']}-upd"} for user in batch]
+                       for batch in user_batches]
+    operations = ('put_create', 'put_update', 'post_query', 'post_query_projected', 'post_get', 'put_delete')
+    measurements = {operation: Measurement(operation, size) for operation in operations}
+    directory.put_delete(owner=BENCH_OWNER)
+    for _ in range(repeat):
+        measurements['put_create'].run([lambda b=b: directory.put_create(users=b) for b in user_batches], size)
+        measurements['put_update'].run([lambda b=b: directory.put_update(b) for b in updated_batches], size)
+        measurements['post_query'].run([lambda: walk(directory, [])], size)
+        measurements['post_query_projected'].run([lambda: walk(directory, ['name'])], size)
+        measurements['post_get'].run([lambda b=b: directory.post_get(users=b) for b in uuid_batches], size)
+        measurements['put_delete'].run([lambda b=b: directory.put_delete(users=b) for b in uuid_batches], size)
+    return [measurement.result() for measurement in measurements.values()]
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--dut', help='address of the device under test or its stand-in')
+    target.add_argument('--simulator', metavar='MODEL', help='run against in-process simulator of given model')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulator latency (s) per request')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='comma separated directory sizes')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='users per write/get request')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='number of passes over each directory size')
+    parser.add_argument('--output', default='-', help='output JSON file, stdout by default')
+    args = parser.parse_args(argv)
+
+    if args.simulator:
+        args.dut = HipSimulator(args.simulator, latency=args.latency).start()
+    dut = HipDevice(args.dut, ssl=False)
+    info = DeviceFacts.shared().get(dut)
+    directory = ApiDir(dut)
+    report: dict[str, Any] = {
+        'dut': args.dut,
+        'model': info.get('variant'),
+        'firmware': f"{info.get('swVersion')} {info.get('buildType')}",
+        'started': datetime.now().isoformat(),
+        'results': [],
+    }
+    try:
+        for size in map(int, args.sizes.split(',')):
+            report['results'].extend(run_size(directory, size, args.batch_size, args.repeat))
+    finally:
+        directory.put_delete(owner=BENCH_OWNER)
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,468 @@
+'''
+Local HIP device simulator.
+
+Implements the endpoints used by ApiDir, ApiCall and ApiPhone on localhost, so the benchmark
+and load tools can run without the polygon:
+
+    /api/dir/template, get, create, update, delete, query, validate (timestamp iterator, series)
+    /api/call/status, dial, answer, hangup (session state machine, calls between simulators)
+    /api/phone/status, /api/phone/calllog, /api/system/info, /api/system/status, /api/config
+
+Per-model user templates are taken from tests/dir/templates. Latency and error rate
+can be injected, e.g.:
+
+    python -m tests.benchmark.hip_simulator --model vario --port 8080 --latency 0.005
+'''
+import argparse
+import copy
+import email.parser
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Optional
+from urllib.parse import urlparse, parse_qs
+from hippy.hip.api.dir_validator import DirValidator
+from tests.dir.dir_templates import templates, thaw
+
+UUID_FORMAT = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+INT32_MIN, INT32_MAX = -2147483648, 2147483647
+VALID_REASONS = ('normal', 'busy', 'rejected', 'noanswer')
+READONLY_FIELDS = ('uuid', 'timestamp', 'deleted')
+# maximum number of users returned by one /api/dir/query call
+QUERY_PAGE_SIZE = 1000
+
+# error codes and descriptions of HTTP API
+ERROR_INVALID_METHOD = (3, 'invalid request method')
+ERROR_MISSING_PARAM = (11, 'missing mandatory parameter')
+ERROR_INVALID_PARAM = (12, 'invalid parameter value')
+ERROR_PROCESSING = (14, 'session not found')
+ERROR_INJECTED = (14, 'injected error')
+ERROR_NOT_FOUND = (2, 'function is not supported')
+
+# simulators running in this process by address, calls between them are connected directly
+simulators: dict[str, 'HipSimulator'] = {}
+
+
+class ApiError(Exception):
+
+    def __init__(self, error: tuple[int, str], param: Optional[str] = None) -> None:
+        super().__init__(error[1])
+        self.code, self.description = error
+        self.param = param
+
+
+class HipSimulator:
+    '''
+    State of one simulated device: directory, call sessions and call log
+    '''
+
+    def __init__(self, model: str = 'vario', latency: float = 0.0, error_rate: float = 0.0,
+                 page_size: int = QUERY_PAGE_SIZE) -> None:
+        '''
+        :param model: key of templates in dir_templates.py
+        :param latency: delay (seconds) added to every response
+        :param error_rate: probability of responding with injected processing error
+        :param page_size: maximum number of users returned by one directory query
+        '''
+        self.model = model
+        self.latency = latency
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.template: dict = thaw(templates[model][0])
+        self.validator = DirValidator.from_templates(templates, model)
+        self.address = ''
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.lock = threading.RLock()
+        self.started = time.time()
+        self.reset()
+
+    def reset(self) -> None:
+        '''factory reset: empty directory with new series, no sessions'''
+        with self.lock:
+            self.series = str(random.randint(1, 2 ** 31))
+            self.timestamp = 0
+            self.users: dict[str, dict] = {}
+            self.sessions: dict[int, dict] = {}
+            self.next_session = 1
+            self.calllog: list[dict] = []
+
+    # ---  server  ---
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        '''starts HTTP server in background thread, returns device address (host:port)'''
+        simulator = self
+
+        class Handler(SimulatorHandler):
+            device = simulator
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.address = f'{host}:{self.server.server_address[1]}'
+        simulators[self.address] = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.address
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            simulators.pop(self.address, None)
+            self.server = None
+
+    def handle(self, method: str, path: str, params: dict[str, str], data: dict) -> Any:
+        '''dispatches request, returns result section of response or raises ApiError'''
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise ApiError(ERROR_INJECTED)
+        route = ROUTES.get(path)
+        if route is None:
+            raise ApiError(ERROR_NOT_FOUND)
+        methods, handler = route
+        if method not in methods:
+            raise ApiError(ERROR_INVALID_METHOD)
+        with self.lock:
+            return handler(self, params, data)
+
+    # ---  system  ---
+
+    def system_info(self, params: dict, data: dict) -> dict:
+        return {'variant': f'Simulated {self.model}', 'firmwarePackage': self.model,
+                'swVersion': '0.0.0.0.0', 'buildType': 'simulator'}
+
+    def system_status(self, params: dict, data: dict) -> dict:
+        now = time.time()
+        return {'systemTime': int(now), 'upTime': int(now - self.started)}
+
+    def config(self, params: dict, data: dict) -> None:
+        return None
+
+    # ---  directory  ---
+
+    def dir_template(self, params: dict, data: dict) -> dict:
+        return {'users': [copy.deepcopy(self.template)]}
+
+    def _next_timestamp(self) -> int:
+        self.timestamp += 1
+        return self.timestamp
+
+    def _project(self, user: dict, fields: Optional[list[str]]) -> dict:
+        if fields is None:
+            result = {name: value for name, value in user.items()
+                      if name in ('uuid', 'timestamp') or value != self.template.get(name)}
+        elif not fields:
+            result = copy.deepcopy(user)
+        else:
+            result = {name: value for name, value in user.items() if name in fields or name in ('uuid', 'timestamp')}
+        if not user.get('deleted'):
+            result.pop('deleted', None)
+        return result
+
+    def _merge(self, target: dict, fields: dict) -> None:
+        for name, value in fields.items():
+            if isinstance(value, dict) and isinstance(target.get(name), dict):
+                self._merge(target[name], value)
+            elif name not in READONLY_FIELDS:
+                target[name] = copy.deepcopy(value)
+
+    def _existing(self, user: dict) -> dict:
+        # checks uuid of get/update/delete request, returns stored user
+        if 'uuid' not in user:
+            raise ApiError((0, 'EDIR_UUID_IS_MISSING'))
+        user_id = user['uuid']
+        if not isinstance(user_id, str) or not UUID_FORMAT.match(user_id):
+            raise ApiError((0, 'EDIR_UUID_INVALID_FORMAT'))
+        stored = self.users.get(user_id)
+        if stored is None or stored['deleted']:
+            raise ApiError((0, 'EDIR_UUID_DOES_NOT_EXIST'))
+        return stored
+
+    @staticmethod
+    def _users_param(data: dict, mandatory: bool = True) -> list:
+        users = data.get('users')
+        if users is None:
+            if mandatory:
+                raise ApiError(ERROR_MISSING_PARAM, 'users')
+            return []
+        if not isinstance(users, list):
+            raise ApiError(ERROR_INVALID_PARAM, 'users')
+        return users
+
+    def _per_user(self, users: list, action: Any) -> dict:
+        results = []
+        for user in users:
+            try:
+                results.append(action(user if isinstance(user, dict) else {}))
+            except ApiError as e:
+                results.append({'uuid': user.get('uuid', '') if isinstance(user, dict) else '',
+                                'errors': [{'code': e.description}]})
+        return {'users': results, 'timestamp': self.timestamp}
+
+    def dir_get(self, params: dict, data: dict) -> dict:
+        fields = data.get('fields')
+        return self._per_user(self._users_param(data, False), lambda user: self._project(self._existing(user), fields))
+
+    def dir_create(self, params: dict, data: dict) -> dict:
+        force = bool(data.get('force', False))
+
+        def create(user: dict) -> dict:
+            errors = self.validator.validate_user(user)
+            if errors:
+                raise ApiError((0, errors[0]['code']))
+            user_id = user.get('uuid') or str(uuid.uuid4())
+            if not isinstance(user_id, str) or not UUID_FORMAT.match(user_id):
+                raise ApiError((0, 'EDIR_FIELD_VALUE_ERROR'))
+            existing = self.users.get(user_id)
+            if existing is not None and not existing['deleted'] and not force:
+                raise ApiError((0, 'EDIR_UUID_ALREADY_EXISTS'))
+            stored = copy.deepcopy(self.template)
+            self._merge(stored, user)
+            stored.update(uuid=user_id, deleted=False, timestamp=self._next_timestamp())
+            self.users.pop(user_id, None)
+            self.users[user_id] = stored
+            return {'uuid': user_id, 'timestamp': stored['timestamp']}
+        return self._per_user(self._users_param(data), create)
+
+    def dir_update(self, params: dict, data: dict) -> dict:
+        def update(user: dict) -> dict:
+            stored = self._existing(user)
+            errors = self.validator.validate_user(user)
+            if errors:
+                raise ApiError((0, errors[0]['code']))
+            self._merge(stored, user)
+            stored['timestamp'] = self._next_timestamp()
+            # keep users ordered by timestamp, so query pages are contiguous
+            self.users[stored['uuid']] = self.users.pop(stored['uuid'])
+            return {'uuid': stored['uuid'], 'timestamp': stored['timestamp']}
+        return self._per_user(self._users_param(data), update)
+
+    def _delete(self, stored: dict) -> dict:
+        # deleted user is kept as tombstone, so incremental queries report the deletion
+        user_id = stored['uuid']
+        self.users.pop(user_id)
+        self.users[user_id] = {'uuid': user_id, 'deleted': True, 'timestamp': self._next_timestamp()}
+        return {'uuid': user_id, 'timestamp': self.timestamp}
+
+    def dir_delete(self, params: dict, data: dict) -> dict:
+        owner = data.get('owner')
+        users = self._users_param(data, mandatory=owner is None)
+        if owner is not None:
+            owned = [user for user in self.users.values() if not user['deleted'] and user.get('owner') == owner]
+            return self._per_user([{'uuid': user['uuid']} for user in owned],
+                                  lambda user: self._delete(self._existing(user)))
+        return self._per_user(users, lambda user: self._delete(self._existing(user)))
+
+    def dir_query(self, params: dict, data: dict) -> dict:
+        fields = data.get('fields')
+        iterator = data.get('iterator', {}).get('timestamp', 0) or 0
+        if data.get('series') not in (None, self.series):
+            iterator = 0    # unexpected series, caller's iterator is meaningless
+        users = [user for user in self.users.values()
+                 if user['timestamp'] >= iterator and (iterator or not user['deleted'])]
+        users.sort(key=lambda user: user['timestamp'])
+        page = users[:self.page_size]
+        result: dict[str, Any] = {'series': self.series, 'users': [self._project(user, fields) for user in page]}
+        if page:
+            result['iterator'] = {'timestamp': page[-1]['timestamp'] + 1}
+        return result
+
+    def dir_validate(self, params: dict, data: dict) -> None:
+        errors = self.validator.validate_user(data)
+        if errors:
+            raise ApiError(ERROR_INVALID_PARAM, errors[0].get('field'))
+
+    # ---  call  ---
+
+    @staticmethod
+    def _session_param(params: dict, mandatory: bool = True) -> Optional[int]:
+        if 'session' not in params:
+            if mandatory:
+                raise ApiError(ERROR_MISSING_PARAM, 'session')
+            return None
+        try:
+            session = int(params['session'])
+        except ValueError:
+            raise ApiError(ERROR_INVALID_PARAM, 'session')
+        if not INT32_MIN <= session <= INT32_MAX:
+            raise ApiError(ERROR_INVALID_PARAM, 'session')
+        return session
+
+    def _session(self, params: dict) -> dict:
+        session = self._session_param(params)
+        if session not in self.sessions:
+            raise ApiError(ERROR_PROCESSING, 'session')
+        return self.sessions[session]
+
+    def _add_session(self, direction: str, peer: str, state: str) -> dict:
+        session = {'session': self.next_session, 'direction': direction, 'state': state,
+                   'peer': peer, 'started': time.time(), 'link': None}
+        self.sessions[self.next_session] = session
+        self.next_session += 1
+        return session
+
+    def _end_session(self, session: dict, reason: str = 'normal') -> None:
+        self.sessions.pop(session['session'], None)
+        self.calllog.append({
+            'id': len(self.calllog) + 1,
+            'direction': session['direction'],
+            'state': 'answered' if session['state'] == 'connected' else reason,
+            'peer': session['peer'],
+            'time': int(session['started']),
+            'duration': int(time.time() - session['started']),
+        })
+
+    def call_status(self, params: dict, data: dict) -> dict:
+        session = self._session_param(params, mandatory=False)
+        sessions = list(self.sessions.values())
+        if session is not None:
+            sessions = [self._session(params)]
+        return {'sessions': [{key: value for key, value in item.items() if key not in ('link', 'started')}
+                             for item in sessions]}
+
+    def call_dial(self, params: dict, data: dict) -> dict:
+        number, users = params.get('number'), params.get('users')
+        if number is None and users is None:
+            raise ApiError(ERROR_MISSING_PARAM, 'number')
+        if users is not None:
+            for user_id in users.split(','):
+                if not user_id:
+                    raise ApiError((12, 'empty UUID'), 'users')
+                if user_id not in self.users or self.users[user_id]['deleted']:
+                    raise ApiError((12, 'invalid UUID'), 'users')
+            number = users
+        session = self._add_session('outgoing', number, 'ringing')
+        target = simulators.get(number.removeprefix('sip:'))
+        if target is not None and target is not self:
+            with target.lock:
+                incoming = target._add_session('incoming', f'sip:{self.address}', 'ringing')
+                incoming['link'] = (self, session['session'])
+                session['link'] = (target, incoming['session'])
+        return {'session': session['session']}
+
+    def call_answer(self, params: dict, data: dict) -> None:
+        session = self._session(params)
+        if session['direction'] != 'incoming':
+            raise ApiError(ERROR_INVALID_PARAM, 'session')
+        session['state'] = 'connected'
+        if session['link'] is not None:
+            peer, peer_session = session['link']
+            with peer.lock:
+                if peer_session in peer.sessions:
+                    peer.sessions[peer_session]['state'] = 'connected'
+
+    def call_hangup(self, params: dict, data: dict) -> None:
+        session = self._session(params)
+        reason = params.get('reason', 'normal')
+        if reason not in VALID_REASONS:
+            raise ApiError(ERROR_INVALID_PARAM, 'reason')
+        self._end_session(session, reason)
+        if session['link'] is not None:
+            peer, peer_session = session['link']
+            with peer.lock:
+                if peer_session in peer.sessions:
+                    peer._end_session(peer.sessions[peer_session], reason)
+
+    # ---  phone  ---
+
+    def phone_status(self, params: dict, data: dict) -> dict:
+        accounts = [{'account': account, 'sipNumber': str(account), 'registrationState': 'registered',
+                     'enabled': True} for account in (1, 2)]
+        if params.get('account'):
+            accounts = [item for item in accounts if str(item['account']) == params['account']]
+            if not accounts:
+                raise ApiError(ERROR_INVALID_PARAM, 'account')
+        return {'accounts': accounts}
+
+    def phone_calllog(self, params: dict, data: dict) -> dict:
+        last_id = int(params.get('id', 0))
+        return {'calls': [call for call in self.calllog if call['id'] > last_id]}
+
+
+ROUTES: dict[str, tuple[tuple[str, ...], Any]] = {
+    '/api/system/info': (('GET', 'POST'), HipSimulator.system_info),
+    '/api/system/status': (('GET', 'POST'), HipSimulator.system_status),
+    '/api/config': (('PUT', 'POST'), HipSimulator.config),
+    '/api/dir/template': (('GET', 'POST'), HipSimulator.dir_template),
+    '/api/dir/get': (('POST',), HipSimulator.dir_get),
+    '/api/dir/create': (('PUT',), HipSimulator.dir_create),
+    '/api/dir/update': (('PUT',), HipSimulator.dir_update),
+    '/api/dir/delete': (('PUT',), HipSimulator.dir_delete),
+    '/api/dir/query': (('POST',), HipSimulator.dir_query),
+    '/api/dir/validate': (('PUT',), HipSimulator.dir_validate),
+    '/api/call/status': (('GET', 'POST'), HipSimulator.call_status),
+    '/api/call/dial': (('GET', 'POST'), HipSimulator.call_dial),
+    '/api/call/answer': (('GET', 'POST'), HipSimulator.call_answer),
+    '/api/call/hangup': (('GET', 'POST'), HipSimulator.call_hangup),
+    '/api/phone/status': (('GET', 'POST'), HipSimulator.phone_status),
+    '/api/phone/calllog': (('GET',), HipSimulator.phone_calllog),
+}
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    device: HipSimulator
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _body(self) -> dict:
+        # JSON request data: raw JSON body or the first part of multipart form (blob)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        if not body:
+            return {}
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/'):
+            message = email.parser.BytesParser().parsebytes(
+                f'Content-Type: {content_type}\r\n\r\n'.encode('utf-8') + body)
+            parts = [part.get_payload(decode=True) for part in message.get_payload()]
+            body = parts[0] if parts else b''
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise ApiError(ERROR_INVALID_PARAM)
+        return data if isinstance(data, dict) else {}
+
+    def _handle(self) -> None:
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        try:
+            result = self.device.handle(self.command, url.path, params, self._body())
+            response: dict[str, Any] = {'success': True}
+            if result is not None:
+                response['result'] = result
+        except ApiError as e:
+            response = {'success': False, 'error': {'code': e.code, 'description': e.description}}
+            if e.param:
+                response['error']['param'] = e.param
+        payload = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='vario', choices=list(templates), help='simulated device model')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='delay (s) added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of injected errors')
+    args = parser.parse_args()
+    simulator = HipSimulator(args.model, args.latency, args.error_rate)
+    print(f'Simulated {args.model} listening on {simulator.start(args.host, args.port)}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == '__main__':
+    main()
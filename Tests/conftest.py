@@ -0,0 +1,25 @@
+import pytest
+from hippy.hip.device import HipDevice
+
+# known issues registry marks collected tests of all directories
+pytest_plugins = ['tests.known_issues']
+
+
+@pytest.fixture(scope='session')
+# overrides dut of hippy plugin, with --cassette=record|replay the DUT of report plugin is returned,
+# which records its communication into cassette or replays it without the device
+def dut(request, dut) -> HipDevice:
+    if request.config.getoption('--cassette', None) is None:
+        return dut
+    return request.config._dut
+
+
+@pytest.fixture(scope='session')
+# returns function wrapping other devices (e.g. additional device) the same way as dut with --cassette=record|replay,
+# the devices are returned unchanged otherwise
+def cassette(request):
+    def wrap(device: HipDevice, name: str):
+        if request.config.getoption('--cassette', None) is None:
+            return device
+        return request.config._cassette_for(device, name)
+    return wrap
@@ -1,510 +1,108 @@
-from typing import Any
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Iterator, Optional
+
+# Directory user templates of all @N devices models, one JSON data file per model in templates/.
+# Templates are loaded lazily on first use, frozen and hashed once, so comparing a device
+# response with its template is a single hash check. For example, the assertation could look:
+#
+# rsp = dir.get_template()
+# assert templates.matches(model, rsp['users'])
+#
+# Models sharing one template:
+#   vario:      VARIO - SAFETY - FORCE
+#   verso:      SOLO - VERSO = VERSO 2.0
+#   accessunit: AU - AU2 - AUM
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+
+
+def freeze(value: Any) -> Any:
+    '''returns immutable copy of JSON structure: dicts become read-only mappings, lists tuples'''
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    '''returns mutable copy of frozen structure'''
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def canonical_hash(value: Any) -> str:
+    '''hash of JSON structure independent of keys order'''
+    return hashlib.sha256(json.dumps(thaw(value), sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
 
-templates: dict[str, Any] = {
-    '''
-    The dictionary holds user templates for all @N devices models.
-    Its items are used in the test, when we want to check if
-    a correct template is returned when requesting api/dir/template endpoint.
 
-    For example, the assertation could look:
+def diff(expected: Any, received: Any, path: str = '') -> list[str]:
+    '''structured difference of two JSON structures, one line per differing path'''
+    if isinstance(expected, Mapping) and isinstance(received, Mapping):
+        lines = []
+        for key in list(expected) + [key for key in received if key not in expected]:
+            item_path = f'{path}.{key}' if path else str(key)
+            if key not in received:
+                lines.append(f'{item_path}: missing')
+            elif key not in expected:
+                lines.append(f'{item_path}: unexpected')
+            else:
+                lines += diff(expected[key], received[key], item_path)
+        return lines
+    if isinstance(expected, (list, tuple)) and isinstance(received, (list, tuple)):
+        if len(expected) != len(received):
+            return [f'{path}: length {len(received)} != {len(expected)}']
+        return [line for index, (a, b) in enumerate(zip(expected, received)) for line in diff(a, b, f'{path}[{index}]')]
+    if thaw(expected) != thaw(received):
+        return [f'{path}: {received!r} != {expected!r}']
+    return []
 
-    rsp = dir.get_template()
-    assert rsp['users'] == templates['vario']
+
+class TemplateStore(Mapping):
+    '''
+    Read-only mapping model -> frozen template (list of users), loaded lazily from data files
     '''
 
-  # ----------------------------------------------------------------------------
-  #  VARIO - SAFETY - FORCE
-  # ----------------------------------------------------------------------------
-  'vario': [
-    {
-      "uuid": "",
-      "deleted": False,
-      "owner": "",
-      "name": "",
-      "photo": "",
-      "email": "",
-      "treepath": "/",
-      "virtNumber": "",
-      "deputy": "",
-      "buttons": "",
-      "callPos": [
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          }
-        ],
-      "access": {
-          "validFrom": "0",
-          "validTo": "0",
-          "accessPoints": [
-            {
-              "enabled": True,
-              "profiles": ""
-            },
-            {
-              "enabled": True,
-              "profiles": ""
-            }
-          ],
-          "virtCard": "",
-          "card": [
-            "", ""
-          ],
-          "pin": "",
-          "accessException": False,
-          "code": [
-            "", "", "", ""
-          ],
-          "licensePlates": "",
-          "liftFloors": ""
-        },
-      "timestamp": 0
-    }
-  ],
-  # ----------------------------------------------------------------------------
-  #  STYLE
-  # ----------------------------------------------------------------------------
-  'style': [
-    {
-      "uuid": "",
-      "deleted": False,
-      "owner": "",
-      "recordType": 0,
-      "name": "",
-      "photo": "",
-      "highlighting": False,
-      "email": "",
-      "treepath": "/",
-      "virtNumber": "",
-      "deputy": "",
-      "callPos": [
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          }
-        ],
-      "access": {
-          "validFrom": "0",
-          "validTo": "0",
-          "accessPoints": [
-            {
-              "enabled": True,
-              "profiles": ""
-            },
-            {
-              "enabled": True,
-              "profiles": ""
-            }
-          ],
-          "pairingExpired": False,
-          "virtCard": "",
-          "card": [
-            "", ""
-          ],
-          "mobkey": "",
-          "fpt": "",
-          "pin": "",
-          "accessException": False,
-          "code": [
-            "", "", "", ""
-          ],
-          "licensePlates": "",
-          "liftFloors": ""
-        },
-      "timestamp": 0
-    }
-  ],
-  # ----------------------------------------------------------------------------
-  #  BASE
-  # ----------------------------------------------------------------------------
-  'base': [
-    {
-      "uuid": "",
-      "deleted": False,
-      "owner": "",
-      "name": "",
-      "email": "",
-      "deputy": "",
-      "buttons": "",
-      "callPos": [
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          }
-        ],
-      "access": {
-          "validFrom": "0",
-          "validTo": "0",
-          "accessPoints": [
-            {
-              "enabled": True,
-              "profiles": ""
-            },
-            {
-              "enabled": True,
-              "profiles": ""
-            }
-          ],
-          "card": [
-            "", ""
-          ],
-          "pin": "",
-          "accessException": False,
-          "code": [
-            "", ""
-          ],
-          "licensePlates": ""
-        },
-      "timestamp": 0
-    }
-  ],
+    def __init__(self, directory: str = TEMPLATES_DIR) -> None:
+        self.directory = directory
+        self._models = sorted(name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json'))
+        self._templates: dict[str, Any] = {}
+        self._hashes: dict[str, str] = {}
+
+    def __getitem__(self, model: str) -> Any:
+        if model not in self._templates:
+            if model not in self._models:
+                raise KeyError(model)
+            with open(os.path.join(self.directory, f'{model}.json')) as f:
+                self._templates[model] = freeze(json.load(f))
+        return self._templates[model]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._models)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def hash(self, model: str) -> str:
+        if model not in self._hashes:
+            self._hashes[model] = canonical_hash(self[model])
+        return self._hashes[model]
+
+    def matches(self, model: str, users: Any) -> bool:
+        '''True when users (e.g. users section of /api/dir/template response) equal the model template'''
+        return canonical_hash(users) == self.hash(model)
 
-  # ----------------------------------------------------------------------------
-  #  UNI
-  # ----------------------------------------------------------------------------
-  'uni': [
-    {
-      "uuid": "",
-      "deleted": False,
-      "owner": "",
-      "name": "",
-      "buttons": "",
-      "callPos": [
-          {
-              "peer": "",
-              "profiles": "",
-              "grouped": False
-          },
-          {
-              "peer": "",
-              "profiles": "",
-              "grouped": False
-          },
-          {
-              "peer": "",
-              "profiles": "",
-              "grouped": False
-          }
-            ],
-      "access": {
-          "code": [
-              ""
-          ]
-          },
-      "timestamp": 0
-    }
-  ],
+    def diff(self, model: str, users: Any) -> Optional[list[str]]:
+        '''None when users match the model template, list of differences otherwise'''
+        if self.matches(model, users):
+            return None
+        return diff(self[model], users)
 
-  # ----------------------------------------------------------------------------
-  #  SOLO - VERSO = VERSO 2.0
-  # ----------------------------------------------------------------------------
-  'verso': [
-    {
-      "uuid": "",
-      "deleted": False,
-      "owner": "",
-      "name": "",
-      "photo": "",
-      "email": "",
-      "treepath": "/",
-      "virtNumber": "",
-      "deputy": "",
-      "buttons": "",
-      "callPos": [
-          {
-              "peer": "",
-              "profiles": "",
-              "grouped": False,
-              "ipEye": ""
-          },
-          {
-              "peer": "",
-              "profiles": "",
-              "grouped": False,
-              "ipEye": ""
-          },
-          {
-              "peer": "",
-              "profiles": "",
-              "grouped": False,
-              "ipEye": ""
-          }
-          ],
-      "access": {
-            "validFrom": "0",
-            "validTo": "0",
-            "accessPoints": [
-                {
-                  "enabled": True,
-                  "profiles": ""
-                },
-                {
-                  "enabled": True,
-                  "profiles": ""
-                }
-            ],
-            "pairingExpired": False,
-            "virtCard": "",
-            "card": [
-                "", ""
-            ],
-            "mobkey": "",
-            "fpt": "",
-            "pin": "",
-            "accessException": False,
-            "code": [
-                "", "", "", ""
-            ],
-            "licensePlates": "",
-            "liftFloors": ""
-            },
-      "timestamp": 0
-    }
-  ],
-  # ----------------------------------------------------------------------------
-  #  AU - AU2 - AUM
-  # ----------------------------------------------------------------------------
-  'accessunit': [
-    {
-      "uuid": "",
-      "deleted": False,
-      "owner": "",
-      "name": "",
-      "email": "",
-      "access": {
-          "validFrom": "0",
-          "validTo": "0",
-          "accessPoints": [
-            {
-              "enabled": True,
-              "profiles": ""
-            },
-            {
-              "enabled": True,
-              "profiles": ""
-            }
-          ],
-          "pairingExpired": False,
-          "virtCard": "",
-          "card": [
-            "", ""
-          ],
-          "mobkey": "",
-          "fpt": "",
-          "pin": "",
-          "accessException": False,
-          "code": [
-            "", ""
-          ],
-          "licensePlates": "",
-          "liftFloors": ""
-        },
-      "timestamp": 0
-      }
-    ],
 
-  # ----------------------------------------------------------------------------
-  #  IPONE
-  # ----------------------------------------------------------------------------
-  'ipone': [
-    {
-      "uuid": "",
-      "deleted": False,
-      "owner": "",
-      "name": "",
-      "photo": "",
-      "email": "",
-      "deputy": "",
-      "buttons": "",
-      "callPos": [
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False
-          }
-        ],
-      "access": {
-          "validFrom": "0",
-          "validTo": "0",
-          "accessPoints": [
-            {
-              "enabled": True,
-              "profiles": ""
-            },
-            {
-              "enabled": True,
-              "profiles": ""
-            }
-          ],
-          "pin": "",
-          "accessException": False,
-          "code": [
-            "", "", "", ""
-          ],
-          "licensePlates": ""
-        },
-      "timestamp": 0
-    }
-  ],
-  # ----------------------------------------------------------------------------
-  #  VIDEOKIT
-  # ----------------------------------------------------------------------------
-  'videokit':  [
-      {
-        "uuid": "",
-        "deleted": False,
-        "owner": "",
-        "name": "",
-        "email": "",
-        "virtNumber": "",
-        "deputy": "",
-        "buttons": "",
-        "callPos": [
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False,
-            "ipEye": ""
-          }
-        ],
-        "access": {
-          "validFrom": "0",
-          "validTo": "0",
-          "accessPoints": [
-            {
-              "enabled": True,
-              "profiles": ""
-            },
-            {
-              "enabled": True,
-              "profiles": ""
-            }
-          ],
-          "pin": "",
-          "accessException": False,
-          "code": [
-            "", "", "", ""
-          ],
-          "licensePlates": ""
-        },
-        "timestamp": 0
-      }
-  ],
-  # ----------------------------------------------------------------------------
-  #  AUDIOKIT
-  # ----------------------------------------------------------------------------
-  'audiokit': [
-      {
-        "uuid": "",
-        "deleted": False,
-        "owner": "",
-        "name": "",
-        "email": "",
-        "virtNumber": "",
-        "deputy": "",
-        "buttons": "",
-        "callPos": [
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False
-          },
-          {
-            "peer": "",
-            "profiles": "",
-            "grouped": False
-          }
-        ],
-        "access": {
-          "validFrom": "0",
-          "validTo": "0",
-          "accessPoints": [
-            {
-              "enabled": True,
-              "profiles": ""
-            },
-            {
-              "enabled": True,
-              "profiles": ""
-            }
-          ],
-          "pin": "",
-          "accessException": False,
-          "code": [
-            "", "", "", ""
-          ],
-          "licensePlates": ""
-        },
-        "timestamp": 0
-      }
-    ]
-}
+templates = TemplateStore()
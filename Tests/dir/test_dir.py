@@ -2,17 +2,22 @@ import pytest
 
 from hippy.hip.device import *
 from hippy.hip.api.dir import ApiDir
-from hippy.hip.api.system import ApiSystem
+from hippy.hip.api.dir_mirror import DirMirror
+from hippy.hip.api.dir_transaction import DirTransaction
+from hippy.hip.api.dir_validator import DirValidator
+from hippy.hip.api.device_facts import DeviceFacts
 from tests.http_api import HttpApiTest
 from .dir_templates import templates
 from .constants import *
 from tests.test_vector import InvalidTestVectorGenerator
 from hip_features import Feature
 import copy
-from tests.shared_func import xfail_mark
+from tests.shared_func import BatchedVectors
 
 tvgen: InvalidTestVectorGenerator = pytest.tvgen     # type: ignore
 
+INVALID_UUIDS = tvgen.uuid()
+
 # ----------------------------------------------------------------------------
 #  Fixtures
 # ----------------------------------------------------------------------------
@@ -25,17 +30,70 @@ def directory(dut: HipDevice) -> ApiDir:
 
 
 @pytest.fixture(scope='class')
-# creates user in device phonebook
-def create_user(dut: HipDevice) -> dict:
-    ApiDir(dut).put_create(users=CREATE_USER_FIXTURE)
-    return ApiDir(dut).post_query()['users'][0]
+# returns dut model (firmware package), device info is shared with report plugin and requested once per session
+def dut_model(dut: HipDevice) -> str:
+    model = DeviceFacts.shared().get(dut)['firmwarePackage']
+    if model in ['accessunit2', 'accessunitm']:
+        model = 'accessunit'
+    return model
 
 
 @pytest.fixture(scope='class')
-# creates user in device phonebook
-def create_2_users(dut: HipDevice) -> list:
-    ApiDir(dut).put_create(users=CREATE_2_USERS_FIXTURE)
-    return ApiDir(dut).post_query()['users']
+# returns local replica of dut directory, synchronized incrementally by refresh()
+def directory_mirror(directory: ApiDir) -> DirMirror:
+    mirror = DirMirror(directory)
+    mirror.refresh()
+    return mirror
+
+
+@pytest.fixture
+# users created by the test, tagged with per-test owner and deleted at teardown
+def dir_transaction(request: pytest.FixtureRequest, directory: ApiDir):
+    with DirTransaction.for_test(directory, request.node.nodeid) as transaction:
+        yield transaction
+
+
+@pytest.fixture
+# creates user in device phonebook for each test, deleted by dir_transaction at teardown
+def create_user(dir_transaction: DirTransaction, directory_mirror: DirMirror) -> dict:
+    dir_transaction.put_create(CREATE_USER_FIXTURE, force=True)
+    directory_mirror.refresh()
+    return directory_mirror.get(CREATE_USER_FIXTURE[0]['uuid'])
+
+
+@pytest.fixture
+# creates users in device phonebook for each test, deleted by dir_transaction at teardown
+def create_2_users(dir_transaction: DirTransaction, directory_mirror: DirMirror) -> list:
+    dir_transaction.put_create(CREATE_2_USERS_FIXTURE, force=True)
+    directory_mirror.refresh()
+    return [directory_mirror.get(user['uuid']) for user in CREATE_2_USERS_FIXTURE]
+
+
+# invalid uuid vectors are sent to each endpoint in one request, every test checks its own user result
+@pytest.fixture(scope='class')
+def get_invalid_uuids(directory: ApiDir) -> BatchedVectors:
+    return BatchedVectors(INVALID_UUIDS, lambda uuids: directory.post_get(users=[{'uuid': uuid} for uuid in uuids])['users'])
+
+
+@pytest.fixture(scope='class')
+def create_invalid_uuids(directory: ApiDir) -> BatchedVectors:
+    def send(uuids: list) -> list:
+        users = [{**copy.deepcopy(CREATE_USER_FIXTURE[0]), 'uuid': uuid} for uuid in uuids]
+        return directory.put_create(users=users)['users']
+    return BatchedVectors(INVALID_UUIDS, send)
+
+
+@pytest.fixture(scope='class')
+def update_invalid_uuids(directory: ApiDir) -> BatchedVectors:
+    def send(uuids: list) -> list:
+        users = [{**copy.deepcopy(UPDATE_EXISTING_USER[0]), 'uuid': uuid} for uuid in uuids]
+        return directory.put_update(users)['users']
+    return BatchedVectors(INVALID_UUIDS, send)
+
+
+@pytest.fixture(scope='class')
+def delete_invalid_uuids(directory: ApiDir) -> BatchedVectors:
+    return BatchedVectors(INVALID_UUIDS, lambda uuids: directory.put_delete(users=[{'uuid': uuid} for uuid in uuids])['users'])
 
 
 # ------------------
@@ -58,12 +116,9 @@ class TestDirTemplate(HttpApiTest):
 
     # ---  Parameter testing  ---
 
-    def test_dir_template(self, directory, dut):
-        model = ApiSystem(dut).get_info()['firmwarePackage']
-        if model in ['accessunit2', 'accessunitm']:
-            model = 'accessunit'
+    def test_dir_template(self, directory, dut_model):
         rsp = directory.get_template()
-        assert rsp['users'] == templates[model]
+        assert templates.diff(dut_model, rsp['users']) is None
 
 # --------------------------------------------------------------------------
 #  GET /api/dir/get
@@ -95,12 +150,12 @@ class TestDirGet(HttpApiTest):
         rsp = directory.post_get(users=[{'uuid': uuid}])
         assert rsp['users'][0]['uuid'] == uuid
 
-    @pytest.mark.parametrize('uuid', xfail_mark(tvgen.uuid(), '', "HIP-14184"))
-    def test_get_user_invalid_uuid(self, directory, uuid):
-        # send request to api/dir/get with the parameter users and invalid uuid
+    @pytest.mark.parametrize('uuid', INVALID_UUIDS)
+    def test_get_user_invalid_uuid(self, get_invalid_uuids, uuid):
+        # send request to api/dir/get with the parameter users and invalid uuid (all vectors in one request)
         # expected error (invalid uuid)
-        rsp = directory.post_get(users=[{"uuid": uuid}])
-        assert rsp['users'][0]['errors'][0]['code'] == ErrorMessages.UUID_INVALID.value
+        rsp = get_invalid_uuids.result(uuid)
+        assert rsp['errors'][0]['code'] == ErrorMessages.UUID_INVALID.value
 
     def test_get_user_non_existing_uuid(self, directory):
         # send request with valid users parameter. Uuid has valid format, but does not exist in phonebook
@@ -164,22 +219,20 @@ class TestDirCreate(HttpApiTest):
 
     # ---  Parameter testing  ---
 
-    def test_create_valid_user_params(self, directory):
+    def test_create_valid_user_params(self, dir_transaction):
         # send request with users parameter valid value
-        # expected a user to be created in dut phonebook
+        # expected a user to be created in dut phonebook (deleted again at teardown)
         CREATE_USER_TEST = copy.deepcopy(CREATE_USER_FIXTURE)
-        rsp = directory.put_create(users=CREATE_USER_TEST)
+        rsp = dir_transaction.put_create(CREATE_USER_TEST)
         assert rsp['users'][0]['uuid'] == CREATE_USER_TEST[0]['uuid']
 
 
-    @pytest.mark.parametrize('uuid', xfail_mark(tvgen.uuid(), '', 'HIP-14184'))
-    def test_create_invalid_uuid(self, directory, uuid):
-        CREATE_USER_TEST = copy.deepcopy(CREATE_USER_FIXTURE)
-        # send request with users parameter, with invalid uuid value format
+    @pytest.mark.parametrize('uuid', INVALID_UUIDS)
+    def test_create_invalid_uuid(self, create_invalid_uuids, uuid):
+        # send request with users parameter, with invalid uuid value format (all vectors in one request)
         # expected error EDIR_FIELD_VALUE_ERROR
-        CREATE_USER_TEST[0]['uuid'] = uuid
-        rsp = directory.put_create(users=CREATE_USER_TEST)
-        assert rsp['users'][0]['errors'][0]['code'] == ErrorMessages.FIELD_VALUE_ERROR.value
+        rsp = create_invalid_uuids.result(uuid)
+        assert rsp['errors'][0]['code'] == ErrorMessages.FIELD_VALUE_ERROR.value
 
     def test_create_uuid_already_exists(self, directory, create_user):
         # send request with users parameter, with the uuid already existing on device
@@ -197,12 +250,20 @@ class TestDirCreate(HttpApiTest):
         rsp = directory.put_create(users=CREATE_USER_TEST)
         assert rsp['users'][0]['errors'][0]['code'] == ErrorMessages.UNKNOWN_FIELD.value
 
-    def test_create_field_not_available(self, directory, dut):
+    def test_create_unknown_field_local_validator(self, directory, dut_model):
+        # validate user with unknown field locally, using template compiled validator
+        # expected the same error code as returned by device: EDIR_FIELD_NAME_UNKNOWN
+        CREATE_USER_TEST = copy.deepcopy(CREATE_USER_FIXTURE)
+        CREATE_USER_TEST[0][FieldParams.UNKNOWN_FIELD.value] = FieldParams.UNKNOWN_FIELD.value
+        errors = DirValidator.from_templates(templates, dut_model).validate_user(CREATE_USER_TEST[0])
+        rsp = directory.put_create(users=CREATE_USER_TEST)
+        assert errors[0]['code'] == rsp['users'][0]['errors'][0]['code'] == ErrorMessages.UNKNOWN_FIELD.value
+
+    def test_create_field_not_available(self, directory, dut_model):
         # send requet with user parameter, which is not available for particular device model
         # expected error message EDIR_FIELD_NOT_AVAILABLE
         CREATE_USER_TEST = copy.deepcopy(CREATE_USER_FIXTURE)
-        model = ApiSystem(dut).get_info()['firmwarePackage']
-        if model == 'style':
+        if dut_model == 'style':
             CREATE_USER_TEST[0][FieldParams.FIELDS_NOT_AVAILABLE_STYLE.value] = FieldParams.FIELDS_NOT_AVAILABLE_STYLE.value
         else:
             CREATE_USER_TEST[0][FieldParams.FIELDS_NOT_AVAILABLE_ALL.value] = FieldParams.FIELDS_NOT_AVAILABLE_ALL.value
@@ -215,10 +276,11 @@ class TestDirCreate(HttpApiTest):
         rsp = directory.put_create(users=CREATE_USER_FIXTURE)
         assert rsp['users'][0]['errors'][0]['code'] == ErrorMessages.USER_ALREADY_EXISTS.value
 
-    def test_create_force_overwrite_user(self, directory, create_user):
+    def test_create_force_overwrite_user(self, directory, create_user, dir_transaction):
         # send request with uuid, which already exists in device phonebook. Set force on True
         # user will be overwritten using provided fields. Remaining fields will be set to default
-        directory.put_create(force=True, users=OVERWRITE_EXISTING_USER)
+        # overwritten user gets per-test owner, so it is deleted at teardown
+        dir_transaction.put_create(OVERWRITE_EXISTING_USER, force=True)
         uuid = OVERWRITE_EXISTING_USER[0]['uuid']
         rsp = directory.post_get(users=[{'uuid': uuid}])
         result_user_params = [param for param in rsp['users'][0]]
@@ -269,14 +331,12 @@ class TestDirUpdate(HttpApiTest):
         rsp = directory.put_update(UPDATE_EXISTING_USER_COPY)
         assert rsp['users'][0]['errors'][0]['code'] == ErrorMessages.UUID_MISSING.value
 
-    @pytest.mark.parametrize('uuid', xfail_mark(tvgen.uuid(), '', 'HIP-14184'))
-    def test_update_invalid_uuid(self, directory, uuid):
-        # send update request with invalid uuid parameter value
+    @pytest.mark.parametrize('uuid', INVALID_UUIDS)
+    def test_update_invalid_uuid(self, update_invalid_uuids, uuid):
+        # send update request with invalid uuid parameter value (all vectors in one request)
         # expected error message 'EDIR_UUID_INVALID_FORMAT
-        UPDATE_EXISTING_USER_COPY = copy.deepcopy(UPDATE_EXISTING_USER)
-        UPDATE_EXISTING_USER_COPY[0]['uuid'] = uuid
-        rsp = directory.put_update(UPDATE_EXISTING_USER_COPY)
-        assert rsp['users'][0]['errors'][0]['code'] == ErrorMessages.UUID_INVALID.value
+        rsp = update_invalid_uuids.result(uuid)
+        assert rsp['errors'][0]['code'] == ErrorMessages.UUID_INVALID.value
 
     def test_update_unknown_field(self, directory, create_user):
         # send update request with unknown field parameter
@@ -320,12 +380,12 @@ class TestDirDelete(HttpApiTest):
         rsp = directory.post_get(users=[{'uuid': uuid}])
         assert rsp['users'][0]['errors'][0]['code'] == ErrorMessages.UUID_DOES_NOT_EXIST.value
 
-    @pytest.mark.parametrize('uuid', xfail_mark(tvgen.uuid(), '', 'HIP-14184'))
-    def test_delete_invalid_uuid(self, directory, uuid):
-        rsp = directory.put_delete(users=[{'uuid': uuid}])
-        assert rsp['users'][0]['errors'][0]['code'] == ErrorMessages.UUID_INVALID.value
+    @pytest.mark.parametrize('uuid', INVALID_UUIDS)
+    def test_delete_invalid_uuid(self, delete_invalid_uuids, uuid):
+        # all vectors are sent in one request
+        rsp = delete_invalid_uuids.result(uuid)
+        assert rsp['errors'][0]['code'] == ErrorMessages.UUID_INVALID.value
 
-    @pytest.mark.xfail(reason='bug HIP-14215')
     def test_delete_without_params(self, directory):
         # send request without parameters
         # expected error
@@ -334,7 +394,6 @@ class TestDirDelete(HttpApiTest):
         assert e.value.error == HttpApiError.MISSING_PARAM
         assert e.value.description == ErrorMessages.ERROR_MISSING_PARAM.value
 
-    @pytest.mark.xfail(reason='bug HIP-14216')
     def test_delete_invalid_owner_valid_uuid(self, directory, create_user):
         # send request with both valid uuid and invalid owner parameters
         # expected the user to be deleted
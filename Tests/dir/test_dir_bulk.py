@@ -0,0 +1,170 @@
+import json
+import uuid
+import pytest
+
+from hippy.hip.device import HipDevice
+from hippy.hip.api.dir import ApiDir
+from hippy.hip.api.dir_bulk import DirBulk, split_users, merge_results, EDIR_REQUEST_FAILED
+from hippy.hip.api.dir_reconciler import DirReconciler
+from tests.benchmark.hip_simulator import HipSimulator
+
+'''Chunking and merging of DirBulk and minimal diffs of DirReconciler, run against local HIP device simulator
+(no DUT needed)'''
+
+MAX_BLOB_SIZE = 2000
+ENVELOPE_SIZE = len(json.dumps({'force': False, 'users': []}))
+
+
+def bulk_users(count: int) -> list[dict]:
+    return [
+        {'uuid': str(uuid.UUID(int=i + 1)), 'owner': 'BULK', 'name': f'bulk{i}', 'callPos': [{'peer': str(1000 + i)}]}
+        for i in range(count)
+    ]
+
+# ----------------------------------------------------------------------------
+#  Fixtures
+# ----------------------------------------------------------------------------
+
+
+@pytest.fixture(scope='module')
+# starts simulator of vario model in background thread
+def simulator():
+    simulator = HipSimulator('vario')
+    simulator.start()
+    yield simulator
+    simulator.stop()
+
+
+@pytest.fixture
+# returns ApiDir of simulator with empty directory
+def sim_directory(simulator: HipSimulator) -> ApiDir:
+    simulator.reset()
+    return ApiDir(HipDevice(simulator.address, ssl=False))
+
+
+@pytest.fixture
+# records write requests of sim_directory as (method, users) pairs
+def writes(sim_directory: ApiDir, monkeypatch) -> list:
+    sent: list = []
+    for name in ('put_create', 'put_update', 'put_delete'):
+        method = getattr(sim_directory, name)
+
+        def record(*args, method=method, name=name, **kwargs):
+            sent.append((name, kwargs.get('users', args[-1] if args else None)))
+            return method(*args, **kwargs)
+
+        monkeypatch.setattr(sim_directory, name, record)
+    return sent
+
+
+class TestSplitUsers:
+
+    def test_chunks_keep_users_order(self):
+        users = bulk_users(120)
+        chunks = list(split_users(users, MAX_BLOB_SIZE))
+        assert len(chunks) > 1
+        assert [user for chunk in chunks for user in chunk] == users
+
+    def test_chunks_fit_blob_size(self):
+        for chunk in split_users(bulk_users(120), MAX_BLOB_SIZE):
+            assert len(json.dumps({'force': False, 'users': chunk}).encode('utf-8')) <= MAX_BLOB_SIZE
+
+    def test_oversized_user_own_chunk(self):
+        # user exceeding the limit by itself is sent alone, users around it are not merged into its chunk
+        users = bulk_users(3)
+        users[1]['name'] = 'x' * MAX_BLOB_SIZE
+        chunks = list(split_users(users, MAX_BLOB_SIZE))
+        assert [users[1]] in chunks
+        assert [user for chunk in chunks for user in chunk] == users
+
+    def test_empty_users(self):
+        assert list(split_users([], MAX_BLOB_SIZE)) == []
+
+
+class TestMergeResults:
+
+    def test_users_order_and_timestamp(self):
+        merged = merge_results([
+            {'users': [{'uuid': 'a'}, {'uuid': 'b'}], 'timestamp': 7},
+            {'users': [{'uuid': 'c'}], 'timestamp': 5},
+        ])
+        assert [user['uuid'] for user in merged['users']] == ['a', 'b', 'c']
+        assert merged['timestamp'] == 7
+
+
+class TestDirBulk:
+
+    def test_create_results_in_input_order(self, sim_directory):
+        users = bulk_users(120)
+        rsp = DirBulk(sim_directory, max_blob_size=MAX_BLOB_SIZE).put_create(users)
+        assert [user['uuid'] for user in rsp['users']] == [user['uuid'] for user in users]
+        assert all('errors' not in user for user in rsp['users'])
+        assert len(list(sim_directory.iter_query())) == len(users)
+
+    def test_update_and_delete(self, sim_directory):
+        users = bulk_users(60)
+        bulk = DirBulk(sim_directory, max_blob_size=MAX_BLOB_SIZE)
+        bulk.put_create(users)
+        rsp = bulk.put_update([{'uuid': user['uuid'], 'name': 'updated'} for user in users])
+        assert all('errors' not in user for user in rsp['users'])
+        assert {user['name'] for user in sim_directory.iter_query(['name'])} == {'updated'}
+        bulk.put_delete([{'uuid': user['uuid']} for user in users])
+        assert list(sim_directory.iter_query()) == []
+
+    def test_failed_chunk_reported_per_user(self, sim_directory, monkeypatch):
+        # request of the chunk with marked user fails as a whole, other chunks are written
+        users = bulk_users(120)
+        bulk = DirBulk(sim_directory, max_blob_size=MAX_BLOB_SIZE)
+        failing = next(chunk for chunk in bulk.chunks(users) if users[50] in chunk)
+        put_create = sim_directory.put_create
+
+        def flaky_put_create(force=None, users=None):
+            if users == failing:
+                raise ConnectionError('device unreachable')
+            return put_create(force=force, users=users)
+
+        monkeypatch.setattr(sim_directory, 'put_create', flaky_put_create)
+        rsp = bulk.put_create(users)
+        assert [user['uuid'] for user in rsp['users']] == [user['uuid'] for user in users]
+        failed = [user['uuid'] for user in rsp['users'] if 'errors' in user]
+        assert failed == [user['uuid'] for user in failing]
+        assert rsp['users'][50]['errors'][0]['code'] == EDIR_REQUEST_FAILED
+        landed = {user['uuid'] for user in sim_directory.iter_query()}
+        assert landed == {user['uuid'] for user in users} - set(failed)
+
+
+class TestDirReconciler:
+
+    def test_unchanged_reapply_sends_no_writes(self, sim_directory, writes):
+        users = bulk_users(20)
+        DirReconciler(sim_directory).apply(users)
+        writes.clear()
+        plan = DirReconciler(sim_directory).apply(users)
+        assert plan.is_empty()
+        assert writes == []
+
+    def test_changed_field_sent_alone(self, sim_directory, writes):
+        users = bulk_users(20)
+        DirReconciler(sim_directory).apply(users)
+        writes.clear()
+        users[5] = {**users[5], 'name': 'renamed'}
+        DirReconciler(sim_directory).apply(users)
+        assert writes == [('put_update', [{'uuid': users[5]['uuid'], 'name': 'renamed'}])]
+
+    def test_dropped_field_reset_to_default(self, sim_directory, writes):
+        # email is not default on the device, desired user without it resets the field to template value
+        user = {**bulk_users(1)[0], 'email': 'bulk@example.com'}
+        DirReconciler(sim_directory).apply([user])
+        writes.clear()
+        desired = {key: value for key, value in user.items() if key != 'email'}
+        DirReconciler(sim_directory).apply([desired])
+        assert writes == [('put_update', [{'uuid': user['uuid'], 'email': ''}])]
+        assert 'email' not in next(sim_directory.iter_query())
+
+    def test_delete_limited_to_owner(self, sim_directory):
+        users = bulk_users(4)
+        foreign = {**users[3], 'owner': 'OTHER'}
+        DirReconciler(sim_directory).apply(users[:3] + [foreign])
+        plan = DirReconciler(sim_directory).apply(users[:1], owner='BULK', delete=True)
+        assert plan.delete == [{'uuid': user['uuid']} for user in users[1:3]]
+        assert {user['uuid'] for user in sim_directory.iter_query()} == {users[0]['uuid'], foreign['uuid']}
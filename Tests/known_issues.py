@@ -0,0 +1,104 @@
+import json
+import os
+from typing import Any, Optional
+import pytest
+
+# tests directory, test ids of the registry are relative to it
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+# default location of known issues registry
+KNOWN_ISSUES_PATH = os.path.join(TESTS_DIR, 'known_issues.json')
+
+# key of issues, which apply to all parameter values of the test
+ANY_PARAM = (None, None)
+
+
+def _param_key(param: Optional[str], value: Any) -> tuple:
+    if param is None:
+        return ANY_PARAM
+    return param, json.dumps(value, sort_keys=True, default=repr)
+
+
+def test_id(item: pytest.Item) -> str:
+    '''
+    Returns id of collected item used by the registry: module path relative to tests directory and qualified name
+    without parameters, e.g. "dir/test_dir.py::TestDirGet::test_get_user_invalid_uuid". Unlike node id,
+    it does not depend on the rootdir pytest runs from
+    '''
+    module = os.path.relpath(os.path.realpath(item.path), TESTS_DIR).replace(os.sep, '/')
+    return '::'.join([module] + item.nodeid.split('[', 1)[0].split('::')[1:])
+
+
+class KnownIssues:
+    '''
+    Central registry of known issues (e.g. Jira bugs), applied to tests at collection time.
+
+    Each entry of the JSON registry holds:
+    :test: id of the test relative to tests directory (see test_id), e.g. "dir/test_dir.py::TestDirGet::test_get_user_invalid_uuid"
+    :param: optional name of the test parameter. When omitted, the issue applies to the whole test
+    :value: value of the parameter the test fails with
+    :reason: the reason test fails, can be Jira issue(bug) number
+    :firmware: optional list of firmware version prefixes the issue applies to (all versions when omitted)
+    :action: "xfail" (default) or "skip" - skipped vectors do not reach the device at all
+    '''
+
+    def __init__(self, issues: list[dict]) -> None:
+        # (test, (param, value)) -> list of issues, looked up in O(1) for each collected item
+        self.index: dict[tuple, list[dict]] = {}
+        # parameter names used by the issues of each test
+        self.params: dict[str, set] = {}
+        for issue in issues:
+            key = _param_key(issue.get('param'), issue.get('value'))
+            self.index.setdefault((issue['test'], key), []).append(issue)
+            self.params.setdefault(issue['test'], set()).add(issue.get('param'))
+
+    @classmethod
+    def load(cls, path: str = KNOWN_ISSUES_PATH) -> 'KnownIssues':
+        with open(path) as file:
+            return cls(json.load(file))
+
+    def lookup(self, test: str, params: dict[str, Any], firmware: Optional[str] = None) -> list[dict]:
+        '''
+        :param test: id of the test relative to tests directory, e.g. "dir/test_dir.py::TestDirGet::test_get_user_invalid_uuid"
+        :param params: test parameters (callspec.params) of collected item
+        :param firmware: DUT firmware version, when unknown only issues without firmware restriction apply
+        :return: list of known issues matching the test
+        '''
+        issues: list[dict] = []
+        for param in self.params.get(test, ()):
+            if param is None:
+                issues += self.index.get((test, ANY_PARAM), [])
+            elif param in params:
+                issues += self.index.get((test, _param_key(param, params[param])), [])
+        return [issue for issue in issues if self._firmware_matches(issue, firmware)]
+
+    @staticmethod
+    def _firmware_matches(issue: dict, firmware: Optional[str]) -> bool:
+        versions = issue.get('firmware')
+        if not versions:
+            return True
+        return firmware is not None and any(firmware.startswith(version) for version in versions)
+
+    def apply(self, items: list[pytest.Item], firmware: Optional[str] = None) -> None:
+        '''
+        Marks collected items with xfail/skip marks of matching known issues
+        '''
+        for item in items:
+            test = test_id(item)
+            if test not in self.params:
+                continue
+            params = item.callspec.params if hasattr(item, 'callspec') else {}
+            for issue in self.lookup(test, params, firmware):
+                if issue.get('action') == 'skip':
+                    item.add_marker(pytest.mark.skip(reason=issue['reason']))
+                else:
+                    item.add_marker(pytest.mark.xfail(reason=issue['reason']))
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    '''
+    Applies known issues registry to collected tests. Firmware is taken from DUT metadata
+    of the report plugin, when available. The module is registered as a plugin by tests/conftest.py,
+    so the registry applies to all test directories, with or without the report plugin.
+    '''
+    firmware = getattr(config, '_metadata', {}).get('DUT Firmware')
+    KnownIssues.load().apply(items, firmware)
@@ -1,6 +1,10 @@
 import time
+import random
 import operator
-from typing import Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
 import pytest
 from _pytest.mark import ParameterSet
 
@@ -24,26 +28,203 @@ def xfail_mark(parameters_list: Any, failed_param: Any, reason: str) -> list:
     return param_list
 
 
-def wait_for(value: Any, timeout: int, period: int, target_func: Any, args: tuple = (), kwargs: dict = {}, operator_func: Any = operator.eq) -> Any:
+@dataclass
+class WaitStats:
+    '''
+    Statistics of one wait_for call
+    :attempts: number of target function calls
+    :elapsed: time (seconds) from the start of waiting to the last target function result
+    :satisfied: True when expected value was received before timeout
+    '''
+    attempts: int = 0
+    elapsed: float = 0.0
+    satisfied: bool = False
+
+
+class BatchedVectors:
+    '''
+    Sends all test vectors of a parametrized test in one request and maps per-vector results
+    back to individual tests. Useful for endpoints accepting arrays and returning per-item results
+    (e.g. users in /api/dir/get), so n vectors cost one round trip instead of n.
+    The request is sent on the first lookup; when it fails as a whole (e.g. one vector breaks
+    the request) or returns other number of results than vectors (device dropped or merged an entry,
+    so results can not be mapped by position), vectors are sent one by one. Exception of a vector is raised only by its own lookup,
+    outcome of the batch is cached either way, so the device is not asked again by other tests.
+    '''
+
+    def __init__(self, parameters_list: Any, send: Any) -> None:
+        '''
+        :parameters_list: the list of elements passed as test parameters (values or pytest.param)
+        :send: function taking list of vectors and returning list of per-vector results in the same order
+        '''
+        self.vectors: list = [item.values[0] if isinstance(item, ParameterSet) else item for item in parameters_list]
+        self.send = send
+        self._results: Optional[dict[str, Any]] = None
+
+    def result(self, vector: Any) -> Any:
+        '''
+        :vector: test parameter value
+        :return: result of the request for given vector
+        '''
+        if self._results is None:
+            try:
+                results = self.send(self.vectors)
+            except Exception:
+                results = None
+            if results is None or len(results) != len(self.vectors):
+                results = [self._send_one(vector) for vector in self.vectors]
+            self._results = {repr(vector): result for vector, result in zip(self.vectors, results)}
+        result = self._results[repr(vector)]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _send_one(self, vector: Any) -> Any:
+        # exception is stored as the vector result, so it fails only the test of this vector
+        try:
+            return self.send([vector])[0]
+        except Exception as error:
+            return error
+
+
+class TestTimings:
+    '''
+    Time spent by the current test waiting in wait_for and talking to devices.
+    Filled by wait_for functions and by the report plugin (HTTP requests), reset for every test.
+    '''
+    __test__ = False    # not a test class
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.wait_time: float = 0.0
+        self.wait_polls: int = 0
+        self.http_time: float = 0.0
+        self.http_requests: int = 0
+
+    def add_wait(self, seconds: float, polls: int) -> None:
+        with self._lock:
+            self.wait_time += seconds
+            self.wait_polls += polls
+
+    def add_http(self, seconds: float) -> None:
+        with self._lock:
+            self.http_time += seconds
+            self.http_requests += 1
+
+    def as_dict(self) -> dict:
+        return {
+            'wait_time': self.wait_time,
+            'wait_polls': self.wait_polls,
+            'http_time': self.http_time,
+            'http_requests': self.http_requests,
+        }
+
+
+test_timings = TestTimings()
+
+
+def wait_for(value: Any, timeout: float, period: float, target_func: Any, args: tuple = (), kwargs: dict = {},
+             operator_func: Any = operator.eq, initial_period: float = 0.1, backoff: float = 1.5,
+             jitter: float = 0.1, stats: Optional[WaitStats] = None) -> Any:
     ''' Waiting for particular target function result
     :param value: target_func result we wait for
     :param timeout: maximum time to wait for target_func result
-    :param period: define interval for calling the targe_func
+    :param period: maximum interval for calling the targe_func
     :param target_func: define target function to be called
     :param *args: tuple, arguments which could be passed to target_func
+    :param initial_period: first interval between calls. It grows by backoff factor up to period,
+    so state changes are noticed quickly, while long waits do not overload the device
+    :param jitter: relative random deviation of intervals, prevents waiters from polling in lockstep
+    :param stats: optional WaitStats object to be filled with statistics of this call
     '''
-    t_start = time.time()
+    stats = stats if stats is not None else WaitStats()
+    t_start = time.monotonic()
+    deadline = t_start + timeout
+    interval = min(initial_period, period)
     kwargs = kwargs or dict()
-    while (time.time() - t_start) < timeout:
-        out = target_func(*args, **kwargs)
-        if operator_func(out, value):
-            return out
-        time.sleep(period)
-    else:
+    try:
+        while True:
+            out = target_func(*args, **kwargs)
+            stats.attempts += 1
+            stats.elapsed = time.monotonic() - t_start
+            if operator_func(out, value):
+                stats.satisfied = True
+                return out
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(interval * random.uniform(1 - jitter, 1 + jitter), remaining))
+            interval = min(interval * backoff, period)
+    finally:
+        test_timings.add_wait(time.monotonic() - t_start, stats.attempts)
+    raise AssertionError(
+        f'Expected value {value} was not received from target function calling within given '
+        f'timeout {timeout}. Received value: {out}'
+    )
+
+
+def wait_for_many(conditions: list[tuple], timeout: float, period: float, any_of: bool = False) -> list:
+    ''' Waiting for several target functions results concurrently, e.g. for states of two devices
+    :param conditions: list of (target_func, value) or (target_func, value, operator_func) tuples,
+    each of them is polled in its own thread the same way as wait_for does
+    :param timeout: maximum time to wait for combined condition
+    :param period: maximum interval for calling each target function
+    :param any_of: when True, return as soon as any condition holds, otherwise wait for all of them
+    :return: list of the last target functions results, in the order of conditions
+    '''
+    t_start = time.monotonic()
+    polls = [0] * len(conditions)
+    results: list = [None] * len(conditions)
+    satisfied: list[bool] = [False] * len(conditions)
+    done = threading.Event()
+    lock = threading.Lock()
+    deadline = time.monotonic() + timeout
+
+    def poll(index: int, target_func: Any, value: Any, operator_func: Any = operator.eq) -> None:
+        interval = min(0.1, period)
+        while not done.is_set():
+            out = target_func()
+            with lock:
+                polls[index] += 1
+                results[index] = out
+                if operator_func(out, value):
+                    satisfied[index] = True
+                    if any_of or all(satisfied):
+                        done.set()
+                    return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            done.wait(min(interval * random.uniform(0.9, 1.1), remaining))
+            interval = min(interval * 1.5, period)
+
+    with ThreadPoolExecutor(max_workers=len(conditions)) as executor:
+        futures = [executor.submit(poll, index, *condition) for index, condition in enumerate(conditions)]
+        try:
+            for future in futures:
+                future.result()
+        finally:
+            done.set()
+            test_timings.add_wait(time.monotonic() - t_start, sum(polls))
+    if not (any(satisfied) if any_of else all(satisfied)):
         raise AssertionError(
-            f'Expected value {value} was not received from target function calling within given '
-            f'timeout {timeout}. Received value: {out}'
+            f'Expected values {[condition[1] for condition in conditions]} were not received from target functions '
+            f'calling within given timeout {timeout}. Received values: {results}'
         )
+    return results
+
+
+def wait_for_all(conditions: list[tuple], timeout: float, period: float) -> list:
+    ''' wait_for_many returning when all conditions hold '''
+    return wait_for_many(conditions, timeout, period)
+
+
+def wait_for_any(conditions: list[tuple], timeout: float, period: float) -> list:
+    ''' wait_for_many returning when any of conditions holds '''
+    return wait_for_many(conditions, timeout, period, any_of=True)
 
 
 # check if length of target function result equals expected value
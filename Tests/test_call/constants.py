@@ -9,7 +9,8 @@ ERROR_PROCESSING = f"session not found"
 ERROR_INVALID_USER = f"invalid UUID"
 ERROR_EMPTY_UUID = f"empty UUID"
 
-period = 3
+# maximum interval between polls, wait_for starts polling faster and backs off up to this value
+period = 1
 timeout = 30
 
 PARAMS_VALID_NUMBERS = [
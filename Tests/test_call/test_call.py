@@ -2,11 +2,13 @@ import pytest
 
 from hip_features import Feature
 from hippy.hip.api.call import ApiCall
+from hippy.hip.api.call_tracker import CallTracker
+from hippy.hip.api.config_manager import ConfigManager
 from hippy.hip.api.dir import ApiDir
 from hippy.hip.api.phone import ApiPhone
 from hippy.hip.device import *
 from tests.http_api import HttpApiTest
-from tests.shared_func import wait_for, compare_result_len
+from tests.shared_func import wait_for, wait_for_all, compare_result_len
 from tests.test_vector import InvalidTestVectorGenerator
 from .constants import *
 
@@ -27,11 +29,20 @@ def call(dut: HipDevice) -> ApiCall:
     return ApiCall(dut)
 
 
+# returns CallTracker of dut shared by all tests. Concurrent waiters share one status poll instead of polling dut each.
+# Its cache lives shorter than wait_for polling interval, so calls dialed directly via `call` are noticed by the next poll
+@pytest.fixture(scope='class')
+def call_tracker(call: ApiCall) -> CallTracker:
+    return CallTracker.shared(call)
+
+
 # returns user_id of the first user from dut directory
 @pytest.fixture(scope="class")
 def user_id(dut: HipDevice) -> str:
-    directory_query = ApiDir(dut).post_query()
-    return directory_query['users'][0]['uuid']
+    user = next(ApiDir(dut).iter_query(), None)
+    if user is None:
+        pytest.fail('dut directory is empty, at least one user is needed for calls to user')
+    return user['uuid']
 
 
 # send request to api/phone/status to check if sip1 account is enabled on dut
@@ -40,17 +51,24 @@ def phone_status(dut: HipDevice) -> dict:
     return api_phone_status['accounts'][0]['enabled']
 
 
+# send request to api/phone/status to check if sip1 account is registered. Registration is dropped
+# while the device reloads configuration, unlike 'enabled' flag, which is already set before upload
+def sip_registered(device: HipDevice) -> bool:
+    api_phone_status = ApiPhone(device).get_status(account=1)
+    return api_phone_status['accounts'][0]['registrationState'] == 'registered'
+
+
 # creates HipDevice instance for another device, which will be used together with dut in some tests.
 # e.g. for initializing incoming call to dut
 # Ip address for additional_device is passed in pytestArgs
 @pytest.fixture(scope='class')
-def additional_device(request: pytest.FixtureRequest):
-    '''Access to the additional device'''
-    device = HipDevice(request.config.option.ADDITIONAL_DEVICE, ssl=False)
+def additional_device(request: pytest.FixtureRequest, cassette):
+    '''Access to the additional device, recorded or replayed together with dut when --cassette is given'''
+    device = cassette(HipDevice(request.config.option.ADDITIONAL_DEVICE, ssl=False), 'additional_device')
     with open('data/config/api-call-config.xml', 'rb') as file:
-        device.upload_config(file.read())
-    # Wait for the device to reload configuration
-    time.sleep(HipDevice.DB_RELOAD_TIME)
+        # upload is skipped, when the same config has already been applied to the device.
+        # Otherwise wait for the device to reload configuration and register sip account
+        ConfigManager.apply(device, file.read(), ready=lambda: sip_registered(device))
     return ApiCall(device)
 
 # --------------------------------------------------------------------------
@@ -81,8 +99,8 @@ class TestCallStatus(HttpApiTest):
         assert 'sessions' in rsp
 
     # send request with valid session id
-    def test_call_status_valid_session(self, dut, call, user_id):
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)
+    def test_call_status_valid_session(self, dut, call, user_id, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         # initialize the call with the user from directory and get session id
         rsp = call.post_dial(users=[user_id])
         session_id = rsp['session']
@@ -92,8 +110,8 @@ class TestCallStatus(HttpApiTest):
 
     # send request with invalid session id param value
     @pytest.mark.parametrize('session_id', tvgen.number(-2147483648, 2147483647))
-    def test_call_status_invalid_session(self, dut, call, session_id):
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)
+    def test_call_status_invalid_session(self, dut, call, session_id, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.get_status(session=session_id)
         assert e.value.error == HttpApiError.INVALID_PARAM
@@ -101,8 +119,8 @@ class TestCallStatus(HttpApiTest):
 
     # send request with valid session id param value, but non-existing session id
     @pytest.mark.parametrize('session_id', PARAMS_SESSION_NOT_FOUND)
-    def test_call_status_session_not_found(self, call, session_id):
-        wait_for({'sessions': []}, 30, 3, target_func=call.get_status)
+    def test_call_status_session_not_found(self, call, session_id, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.get_status(session=session_id)  # send request with non-existing session id
         assert e.value.error == HttpApiError.PROCESSING
@@ -131,8 +149,8 @@ class TestDial(HttpApiTest):
     # ---  Parameter testing  ---
 
     # send request without mandatory parameters
-    def test_dial_call_without_param(self, call):
-        wait_for({'sessions': []}, 30, 3, target_func=call.get_status)  # wait for no session to be in progress
+    def test_dial_call_without_param(self, call, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)  # wait for no session to be in progress
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_dial()
         # Test if given error code and description is correct
@@ -141,17 +159,17 @@ class TestDial(HttpApiTest):
 
     # send request with only one mandatory parameter: 'number'
     @pytest.mark.parametrize('number', PARAMS_VALID_NUMBERS)
-    def test_dial_valid_number(self, dut, number, call):
+    def test_dial_valid_number(self, dut, number, call, call_tracker):
         wait_for(True, timeout, period, target_func=lambda: phone_status(dut))
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)  # wait for no session to be in progress
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)  # wait for no session to be in progress
         # Initialize the call. Session id is a number, other that 0
         rsp = call.post_dial(number=f'sip:{number}')
         session_id = rsp['session']
         assert session_id != 0
 
     # send request with only one valid mandatory parameter: 'user'.
-    def test_dial_valid_user(self, user_id, call):
-        wait_for({'sessions': []}, 30, 3, target_func=call.get_status)
+    def test_dial_valid_user(self, user_id, call, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         # Initialize the call. Session id is a number, other than 0
         rsp = call.post_dial(users=[user_id])
         session_id = rsp['session']
@@ -159,8 +177,8 @@ class TestDial(HttpApiTest):
 
     # send request with with invalid user param
     @pytest.mark.parametrize('users', tvgen.uuid())
-    def test_dial_invalid_user(self, users, call):
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)
+    def test_dial_invalid_user(self, users, call, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_dial(users=[users])
         assert e.value.error == HttpApiError.INVALID_PARAM
@@ -195,27 +213,29 @@ class TestAnswerCall(HttpApiTest):
     # ---  Parameter testing  ---
 
     # send request without mandatory parameters
-    def test_answer_without_session_param(self, call):
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)
+    def test_answer_without_session_param(self, call, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_answer(session=None)
         assert e.value.error == HttpApiError.MISSING_PARAM
         assert e.value.description == ERROR_MISSING_PARAM
 
     # send request with valid call session
-    def test_answer_valid_session(self, additional_device, call, dut):
+    def test_answer_valid_session(self, additional_device, call, dut, call_tracker):
         # use another HipDevice to initialize incoming call to dut
-        wait_for({'sessions': []}, 30, 3, target_func=additional_device.get_status)
+        # wait for both devices to be idle, concurrently
+        wait_for_all([(additional_device.get_status, {'sessions': []}), (call_tracker.get_status, {'sessions': []})],
+                     timeout, period)
         additional_device.post_dial(number=f'sip:{dut._address}')
-        session_list = wait_for(1, timeout, period, lambda: call.get_status()['sessions'], operator_func=compare_result_len)
+        session_list = wait_for(1, timeout, period, lambda: call_tracker.get_status()['sessions'], operator_func=compare_result_len)
         session_id = session_list[0]['session']
         rsp = call.post_answer(session=session_id)
         assert rsp is None
 
     # send request with invalid call session id parameter value
     @pytest.mark.parametrize('session', tvgen.number(-2147483648, 2147483647))
-    def test_answer_invalid_session(self, call, session):
-        wait_for({'sessions': []}, 30, 3, target_func=call.get_status)
+    def test_answer_invalid_session(self, call, session, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_answer(session=session)
         assert e.value.error == HttpApiError.INVALID_PARAM or e.value.error == HttpApiError.MISSING_PARAM
@@ -223,8 +243,8 @@ class TestAnswerCall(HttpApiTest):
 
     # send request with invalid session id, but valid parameter value
     @pytest.mark.parametrize('session', PARAMS_SESSION_NOT_FOUND)
-    def test_answer_session_not_found(self, call, session):
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)
+    def test_answer_session_not_found(self, call, session, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_answer(session=session)
         assert e.value.error == HttpApiError.PROCESSING
@@ -259,34 +279,40 @@ class TestCallHangup(HttpApiTest):
     # ---  Parameter testing  ---
 
     # send request with valid call session id
-    def test_hangup_valid_session_no_reason(self, additional_device, call, dut):
+    def test_hangup_valid_session_no_reason(self, additional_device, call, dut, call_tracker):
         # use another HipDevice to initialize the call to dut
-        wait_for({'sessions': []}, timeout, period, target_func=additional_device.get_status)
+        # wait for both devices to be idle, concurrently
+        wait_for_all([(additional_device.get_status, {'sessions': []}), (call_tracker.get_status, {'sessions': []})],
+                     timeout, period)
         additional_device.post_dial(number=f'sip:{dut._address}')
-        session_list = wait_for(1, timeout, period, lambda: call.get_status()['sessions'], operator_func=compare_result_len)
+        session_list = wait_for(1, timeout, period, lambda: call_tracker.get_status()['sessions'], operator_func=compare_result_len)
         session_id = session_list[0]['session']
         rsp = call.post_hangup(session=session_id)
         assert rsp is None
 
     # send request with valid session idand valid reason parameteres
     @pytest.mark.parametrize('reason', PARAMS_VALID_REASON)
-    def test_hangup_valid_session_reason(self, additional_device, call, dut, reason):
+    def test_hangup_valid_session_reason(self, additional_device, call, dut, reason, call_tracker):
         # use another HipDevice to initialize the call to dut
-        wait_for({'sessions': []}, timeout, period, target_func=additional_device.get_status)
+        # wait for both devices to be idle, concurrently
+        wait_for_all([(additional_device.get_status, {'sessions': []}), (call_tracker.get_status, {'sessions': []})],
+                     timeout, period)
         additional_device.post_dial(number=f'sip:{dut._address}')
-        session_list = wait_for(1, timeout, period, lambda: call.get_status()['sessions'], operator_func=compare_result_len)
+        session_list = wait_for(1, timeout, period, lambda: call_tracker.get_status()['sessions'], operator_func=compare_result_len)
         session_id = session_list[0]['session']
         rsp = call.post_hangup(session=session_id, reason=reason)
         assert rsp is None
 
     # send request with invalid reason parameter
     @pytest.mark.parametrize('reason', tvgen.enum(PARAMS_VALID_REASON))
-    def test_hangup_valid_session_invalid_reason(self, additional_device, call, dut, reason):
+    def test_hangup_valid_session_invalid_reason(self, additional_device, call, dut, reason, call_tracker):
         # create another HipDevice to initialize the call to dut
-        wait_for({'sessions': []}, timeout, period, target_func=additional_device.get_status)
+        # wait for both devices to be idle, concurrently
+        wait_for_all([(additional_device.get_status, {'sessions': []}), (call_tracker.get_status, {'sessions': []})],
+                     timeout, period)
         additional_device.post_dial(number=f'sip:{dut._address}')
         # wait untill dut creates incoming call session on its side
-        session_list = wait_for(1, timeout, period, lambda: call.get_status()['sessions'], operator_func=compare_result_len)
+        session_list = wait_for(1, timeout, period, lambda: call_tracker.get_status()['sessions'], operator_func=compare_result_len)
         session_id = session_list[0]['session']
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_hangup(session=session_id, reason=reason)
@@ -294,8 +320,8 @@ class TestCallHangup(HttpApiTest):
         assert e.value.description == ERROR_INVALID_PARAM
 
     # send request with empty session parameter
-    def test_hangup_without_session_param(self, call):
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)
+    def test_hangup_without_session_param(self, call, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_hangup(session=None)
         assert e.value.error == HttpApiError.MISSING_PARAM
@@ -303,8 +329,8 @@ class TestCallHangup(HttpApiTest):
 
     # send request with invalid call session id parameter value. Without reason parameter
     @pytest.mark.parametrize('session', tvgen.number(-2147483648, 2147483647))
-    def test_hangup_invalid_session(self, call, session):
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)
+    def test_hangup_invalid_session(self, call, session, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_hangup(session=session)
         assert e.value.error == HttpApiError.INVALID_PARAM
@@ -312,8 +338,8 @@ class TestCallHangup(HttpApiTest):
 
     # send request with non-existing session id, but valid session id parameter value. Without reason parameter
     @pytest.mark.parametrize('session', PARAMS_SESSION_NOT_FOUND)
-    def test_hangup_session_not_found(self, call, session):
-        wait_for({'sessions': []}, timeout, period, target_func=call.get_status)
+    def test_hangup_session_not_found(self, call, session, call_tracker):
+        wait_for({'sessions': []}, timeout, period, target_func=call_tracker.get_status)
         with pytest.raises(HipDevice.RequestFailed) as e:
             call.post_hangup(session=session)
         assert e.value.error == HttpApiError.PROCESSING